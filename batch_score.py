@@ -0,0 +1,225 @@
+"""
+Headless batch scoring of Child Growth Analyzer dataset files
+
+Computes the WHO height-for-age percentile of every measurement in a set of
+dataset CSV files and writes one consolidated, semicolon separated file.
+
+Usage:
+    python -m batch_score INPUT [INPUT ...] -o scores.csv [--sex both] [--workers 8] [--growth]
+
+INPUT may be a CSV file, a directory (all *.csv files in it) or a glob
+pattern such as "exports/**/*.csv".
+
+With --growth, every file is treated as one child and the output also gets
+the LMS z-score, the growth velocity (cm/year), z-score change and
+percentile-channel crossings since the child's previous measurement, and a
+growth faltering flag (see growth_analysis).
+"""
+
+import argparse
+import glob
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+OUTPUT_COLUMNS = ['File', 'Birthdate', 'Age', 'Height']
+GROWTH_COLUMNS = {'zscore': 'ZScore', 'velocity': 'Velocity', 'zscore_delta': 'ZScore_Delta',
+                  'crossings': 'Crossings', 'faltering': 'Faltering'}
+
+# Per-worker WHO interpolators, created once by _init_worker
+_interpolators = None
+
+
+def find_input_files(inputs, recursive=False):
+    """Expand files, directories and glob patterns into a sorted list of CSV paths"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*.csv') if recursive else os.path.join(item, '*.csv')
+            files.extend(glob.glob(pattern, recursive=recursive))
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            files.extend(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+    return sorted(set(files))
+
+
+def _init_worker(reference_handle=None):
+    """Set up a worker; with a handle it attaches to the parent's shared WHO tables"""
+    global _interpolators
+    from who_data import attach_reference_engine, create_percentile_interpolators
+    if reference_handle is not None:
+        attach_reference_engine(reference_handle)
+    _interpolators = create_percentile_interpolators()
+
+
+def score_dataset(df, sexes):
+    """Return {sex: percentile array} for the 'Age'/'Height' columns of df.
+
+    Ages outside the WHO reference range get NaN.
+    """
+    from who_data import calculate_percentiles_batch, reference_age_range
+
+    if _interpolators is None:
+        _init_worker()
+
+    ages = df['Age'].to_numpy(dtype=float)
+    heights = df['Height'].to_numpy(dtype=float)
+    min_age, max_age = reference_age_range()
+    in_range = (ages >= min_age) & (ages <= max_age)
+
+    scores = {}
+    for sex in sexes:
+        values = np.full(len(ages), np.nan)
+        if in_range.any():
+            values[in_range] = calculate_percentiles_batch(ages[in_range], heights[in_range],
+                                                           sex, _interpolators)
+        scores[sex] = values
+    return scores
+
+
+def score_files(paths, sexes, growth_sex=None):
+    """Worker task: score a group of files.
+
+    With `growth_sex` ('both', 'boys' or 'girls'), the growth analysis of
+    all the files runs as one cohort pass, one child per file. Returns
+    (list of result DataFrames, list of (path, error message) for files that
+    could not be read, list of (path, warning) for files that were scored
+    without growth columns).
+    """
+    import pandas as pd
+    from dataset_io import read_dataset
+
+    loaded, errors, warnings = [], [], []
+    for path in paths:
+        try:
+            df, birthdate = read_dataset(path)
+        except Exception as e:
+            errors.append((path, str(e)))
+            continue
+        loaded.append((path, df, birthdate))
+
+    growth = None
+    if growth_sex is not None and loaded:
+        from growth_analysis import analyze_growth
+        rows = sum(len(df) for _, df, _ in loaded)
+        try:
+            growth = analyze_growth(np.repeat(np.arange(len(loaded)), [len(df) for _, df, _ in loaded]),
+                                    np.concatenate([df['Age'].to_numpy(dtype=float) for _, df, _ in loaded]),
+                                    np.concatenate([df['Height'].to_numpy(dtype=float) for _, df, _ in loaded]),
+                                    growth_sex)
+        except Exception as e:
+            # Keep the percentiles; leave the growth columns empty for this task
+            warnings.extend((path, f"growth analysis failed ({e}); growth columns left empty")
+                            for path, _, _ in loaded)
+            growth = {key: np.full(rows, np.nan) for key in GROWTH_COLUMNS}
+
+    results = []
+    start = 0
+    for path, df, birthdate in loaded:
+        columns = {
+            'File': path,
+            'Birthdate': birthdate or '',
+            'Age': df['Age'].to_numpy(dtype=float),
+            'Height': df['Height'].to_numpy(dtype=float),
+        }
+        for sex, values in score_dataset(df, sexes).items():
+            columns[f'Percentile_{sex.capitalize()}'] = values
+        if growth is not None:
+            end = start + len(df)
+            for key, column in GROWTH_COLUMNS.items():
+                columns[column] = growth[key][start:end]
+            start = end
+        results.append(pd.DataFrame(columns))
+    return results, errors, warnings
+
+
+def run(files, output_path, sexes, workers=None, files_per_task=64, growth_sex=None):
+    """Score `files` in a process pool and write the results to output_path.
+
+    At most two tasks per worker are in flight, and results are written in
+    input order as soon as they are ready, so memory stays bounded no matter
+    how many files are processed. The WHO tables are loaded once here and
+    shared with the workers through shared memory. Returns (rows written,
+    list of errors, list of warnings).
+    """
+    from who_data import publish_reference_engine
+
+    workers = workers or os.cpu_count() or 1
+    tasks = [files[i:i + files_per_task] for i in range(0, len(files), files_per_task)]
+    rows = 0
+    all_errors, all_warnings = [], []
+
+    reference_block, reference_handle = publish_reference_engine()
+    try:
+        with open(output_path, 'w', encoding='utf-8', newline='') as out, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                    initargs=(reference_handle,)) as pool:
+            header_written = False
+            pending = deque()
+            next_task = 0
+            while next_task < len(tasks) or pending:
+                while next_task < len(tasks) and len(pending) < 2 * workers:
+                    pending.append(pool.submit(score_files, tasks[next_task], sexes, growth_sex))
+                    next_task += 1
+
+                results, errors, warnings = pending.popleft().result()
+                all_errors.extend(errors)
+                all_warnings.extend(warnings)
+                for result in results:
+                    result.to_csv(out, sep=';', index=False, header=not header_written)
+                    header_written = True
+                    rows += len(result)
+    finally:
+        # The workers have exited; release the shared WHO tables
+        reference_block.close()
+        reference_block.unlink()
+
+    return rows, all_errors, all_warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m batch_score',
+        description="Compute WHO height-for-age percentiles for dataset CSV files.")
+    parser.add_argument('inputs', nargs='+', help="CSV files, directories or glob patterns")
+    parser.add_argument('-o', '--output', required=True, help="consolidated output CSV file")
+    parser.add_argument('--sex', choices=['both', 'boys', 'girls'], default='both',
+                        help="which WHO standard to score against (default: both)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="also search subdirectories of input directories")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument('--files-per-task', type=int, default=64,
+                        help="files handed to a worker at a time (default: 64)")
+    parser.add_argument('--growth', action='store_true',
+                        help="add growth velocity, z-score change, channel crossings and "
+                             "faltering per measurement (one child per file)")
+    args = parser.parse_args(argv)
+
+    files = find_input_files(args.inputs, recursive=args.recursive)
+    # A previous output file in an input directory is not a dataset
+    output = os.path.normcase(os.path.abspath(args.output))
+    files = [path for path in files if os.path.normcase(os.path.abspath(path)) != output]
+    if not files:
+        print("No CSV files found", file=sys.stderr)
+        return 1
+
+    sexes = ['boys', 'girls'] if args.sex == 'both' else [args.sex]
+    rows, errors, warnings = run(files, args.output, sexes, workers=args.workers,
+                                 files_per_task=args.files_per_task,
+                                 growth_sex=args.sex if args.growth else None)
+
+    for path, message in errors:
+        print(f"Failed to read {path}: {message}", file=sys.stderr)
+    for path, message in warnings:
+        print(f"Warning: {path}: {message}", file=sys.stderr)
+    print(f"Scored {rows} measurements from {len(files) - len(errors)} files into {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Benchmark suite for the WHO percentile code and the chart hot paths.
+
+Runs a fixed set of workloads with fixed random seeds, reports the median
+time of several repeats and compares it with the stored baselines in
+benchmarks/baselines.json. A benchmark regresses when its median exceeds
+the baseline by more than its threshold (a factor, 1.25 = 25% slower); the
+exit status is 1 if any benchmark regressed.
+
+Baselines are only comparable on the machine they were recorded on; record
+them again with --save-baseline after moving to new hardware or after an
+intended performance change.
+
+The chart benchmarks run GrowthPlot, which is what update_display and
+on_mouse_move delegate to, on a headless Agg canvas. The Tk table is not
+covered.
+
+Usage (no display needed, run from anywhere):
+    python benchmarks/run_benchmarks.py [--repeat 5] [--only NAME ...]
+    python benchmarks/run_benchmarks.py --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(REPO_DIR, 'benchmarks', 'baselines.json')
+DEFAULT_THRESHOLD = 1.25
+
+sys.path.insert(0, REPO_DIR)
+
+
+def _random_measurements(rng, count):
+    ages = rng.uniform(0.1, 18.9, count)
+    heights = 50 + 6.2 * ages + rng.normal(0, 4, count)
+    return ages, heights
+
+
+# Each benchmark takes the random generator and returns (function to time,
+# units of work per call, unit name). Setup work is done before returning.
+
+def bench_import_who_data(rng):
+    """Cold import of who_data and loading the reference tables, in a fresh interpreter"""
+    code = "import who_data; who_data.load_reference_tables()"
+
+    def run():
+        subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, check=True)
+    return run, 1, 'import'
+
+
+def bench_reference_tables_artifact(rng):
+    """Reference tables from the precomputed .npz artifact"""
+    import who_data
+    return who_data._load_reference_artifact, 1, 'load'
+
+
+def bench_reference_tables_csv(rng):
+    """Reference tables rebuilt from the WHO CSV files (parse + LMS fit)"""
+    import who_data
+    return who_data._tables_from_csv, 1, 'build'
+
+
+def bench_create_interpolators(rng):
+    """create_percentile_interpolators with a cold reference engine"""
+    import who_data
+    who_data.load_reference_tables()
+
+    def run():
+        who_data._reference_engines.clear()
+        who_data.create_percentile_interpolators()
+    return run, 1, 'call'
+
+
+def bench_scalar_percentiles(rng):
+    """calculate_exact_percentile for single points (tooltip path, uncached)"""
+    from who_data import calculate_exact_percentile, create_percentile_interpolators
+    interpolators = create_percentile_interpolators()
+    ages, heights = _random_measurements(rng, 2000)
+    points = list(zip(ages.tolist(), heights.tolist()))
+
+    def run():
+        for age, height in points:
+            calculate_exact_percentile(age, height, interpolators, 'both')
+    return run, len(points), 'point'
+
+
+def bench_batch_percentiles(rng):
+    """calculate_percentiles_batch over one million measurements"""
+    from who_data import calculate_percentiles_batch, create_percentile_interpolators
+    interpolators = create_percentile_interpolators()
+    ages, heights = _random_measurements(rng, 1_000_000)
+
+    def run():
+        calculate_percentiles_batch(ages, heights, 'both', interpolators)
+    return run, len(ages), 'point'
+
+
+def bench_csv_load(rng):
+    """read_dataset (the load_dataset parser) on a 500k row decimal-comma file"""
+    from dataset_io import read_dataset
+    ages, heights = _random_measurements(rng, 500_000)
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        f.write("Birthdate;12.11.2002\nAge;Height\n")
+        f.writelines(f"{a:.4f};{h:.1f}\n".replace('.', ',') for a, h in zip(ages, heights))
+    _cleanup.append(path)
+
+    def run():
+        read_dataset(path)
+    return run, len(ages), 'row'
+
+
+def _chart(rng, datasets, points):
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from growth_plot import GrowthPlot
+    from measurement_store import MeasurementStore
+
+    store = MeasurementStore()
+    for i in range(datasets):
+        ages, heights = _random_measurements(rng, points)
+        store.add_dataset(f'Child {i}', ages, heights, '12.11.2002')
+
+    fig = Figure(figsize=(12, 8))
+    FigureCanvasAgg(fig)
+    plot = GrowthPlot(fig, ['red', 'blue', 'green', 'purple', 'orange'])
+    plot.set_reference_curves(['boys', 'girls'], ['P3', 'P50', 'P97'])
+    plot.update(store)
+    fig.canvas.draw()
+    return store, plot
+
+
+def bench_update_display(rng):
+    """Chart refresh after adding a point to one of 20 datasets (500 points each)"""
+    store, plot = _chart(rng, 20, 500)
+
+    # draw_idle renders right away on Agg, so update() includes the drawing
+    def run():
+        store.append('Child 3', 5.0, 110.0)
+        plot.update(store, changed=['Child 3'])
+    return run, 1, 'refresh'
+
+
+def bench_mouse_move(rng):
+    """Tooltip handling for 200 mouse moves, alternately onto and off a point, over 20 datasets"""
+    from matplotlib.backend_bases import MouseEvent
+    from who_data import cached_exact_percentile, clear_percentile_cache
+
+    store, plot = _chart(rng, 20, 500)
+    canvas = plot.fig.canvas
+    targets = plot.ax.transData.transform(
+        list(zip(store.age[:100].tolist(), store.height[:100].tolist())))
+    events = [MouseEvent('motion_notify_event', canvas, x + dx, y)
+              for (x, y) in targets for dx in (0, 40)]
+
+    def calculate(age, height, gender):
+        return cached_exact_percentile(age, height, gender=gender)
+
+    def run():
+        clear_percentile_cache()
+        plot.point_index._percentiles.clear()
+        for event in events:
+            plot.on_mouse_move(event, 'both', calculate)
+    return run, len(events), 'move'
+
+
+BENCHMARKS = {
+    'import_who_data': bench_import_who_data,
+    'reference_tables_artifact': bench_reference_tables_artifact,
+    'reference_tables_csv': bench_reference_tables_csv,
+    'create_interpolators': bench_create_interpolators,
+    'scalar_percentiles': bench_scalar_percentiles,
+    'batch_percentiles': bench_batch_percentiles,
+    'csv_load': bench_csv_load,
+    'update_display': bench_update_display,
+    'mouse_move': bench_mouse_move,
+}
+
+_cleanup = []
+
+
+def measure(name, repeat):
+    """Median and min seconds per call of one benchmark"""
+    import numpy as np
+
+    run, units, unit = BENCHMARKS[name](np.random.default_rng(42))
+    run()  # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times), 'units': units, 'unit': unit}
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baselines(results, previous):
+    baselines = {
+        'machine': {'platform': platform.platform(), 'processor': platform.processor(),
+                    'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'benchmarks': {},
+    }
+    for name, result in results.items():
+        old = previous.get('benchmarks', {}).get(name, {})
+        baselines['benchmarks'][name] = {
+            'median': round(result['median'], 6),
+            'threshold': old.get('threshold', DEFAULT_THRESHOLD),
+        }
+    with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2)
+        f.write('\n')
+
+
+def _format_time(seconds):
+    return f"{seconds * 1000:9.2f} ms" if seconds >= 1e-3 else f"{seconds * 1e6:9.2f} us"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per benchmark (default: 5)")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), metavar='NAME',
+                        help="run only these benchmarks: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store the results as the new baselines")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+    try:
+        for name in names:
+            result = results[name] = measure(name, args.repeat)
+            per_unit = result['median'] / result['units']
+            line = f"{name:28s}{_format_time(result['median'])}"
+            if result['units'] > 1:
+                line += f"  ({_format_time(per_unit).strip()} per {result['unit']})"
+
+            baseline = baselines.get('benchmarks', {}).get(name)
+            if baseline and not args.save_baseline:
+                ratio = result['median'] / baseline['median']
+                line += f"  {ratio:5.2f}x baseline"
+                if ratio > baseline.get('threshold', DEFAULT_THRESHOLD):
+                    line += "  REGRESSION"
+                    regressions.append(name)
+            print(line, flush=True)
+    finally:
+        for path in _cleanup:
+            os.remove(path)
+
+    if args.save_baseline:
+        if args.only:
+            # Keep the baselines of benchmarks that were not run
+            results = {**{name: {'median': b['median']} for name, b in baselines.get('benchmarks', {}).items()},
+                       **results}
+        save_baselines(results, baselines)
+        print(f"Baselines saved to {BASELINE_FILE}")
+        return 0
+
+    if not baselines:
+        print("No baselines stored yet; record them with --save-baseline")
+    elif regressions:
+        print(f"{len(regressions)} benchmark(s) slower than their threshold: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
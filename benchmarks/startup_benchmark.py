@@ -0,0 +1,83 @@
+"""
+Startup benchmark for the Child Growth Analyzer.
+
+Starts the application in fresh Python processes and reports:
+- time to first window: process launch until the main window is mapped
+- time to first chart: process launch until a dataset has been plotted
+
+Both are measured from just before the process is launched, so they include
+interpreter startup. The child process reports wall-clock timestamps, which
+(unlike perf_counter) are comparable between processes.
+
+Usage (needs a display, run from anywhere):
+    python benchmarks/startup_benchmark.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_FILE = os.path.join(REPO_DIR, 'data', 'Example.csv')
+
+
+def measure_once():
+    """Start the app in this process and return the wall-clock times of its milestones."""
+    os.chdir(REPO_DIR)  # the app loads its icon relative to the working directory
+    sys.path.insert(0, REPO_DIR)
+
+    import tkinter as tk
+    from main import ChildGrowthAnalyzer
+
+    root = tk.Tk()
+    app = ChildGrowthAnalyzer(root)
+    while not root.winfo_viewable():
+        root.update()
+    first_window = time.time()
+
+    from dataset_io import read_dataset
+    df, birthdate = read_dataset(EXAMPLE_FILE)
+    app.store.add_dataset('Example', df['Age'], df['Height'], birthdate)
+    app.update_dataset_combo()
+    app.update_display()
+    root.update()
+    first_chart = time.time()
+
+    root.destroy()
+    return {'first_window': first_window, 'first_chart': first_chart}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="number of cold starts to measure")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return
+
+    results = []
+    for _ in range(args.runs):
+        launched = time.time()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'],
+                                capture_output=True, text=True)
+        if output.returncode != 0:
+            print(output.stderr, file=sys.stderr)
+            sys.exit("Startup benchmark failed (a display is required)")
+        milestones = json.loads(output.stdout.strip().splitlines()[-1])
+        results.append({key: stamp - launched for key, stamp in milestones.items()})
+
+    for key, label in (('first_window', "Time to first window"),
+                       ('first_chart', "Time to first plotted chart")):
+        values = [r[key] for r in results]
+        print(f"{label}: median {statistics.median(values) * 1000:.0f} ms "
+              f"(min {min(values) * 1000:.0f} ms, max {max(values) * 1000:.0f} ms, {len(values)} runs)")
+
+
+if __name__ == "__main__":
+    main()
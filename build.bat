@@ -4,6 +4,9 @@ echo Building Child Growth Analyzer...
 rem Clean previous build
 rmdir /s /q build dist
 
+rem Rebuild precomputed WHO reference tables
+python build_who_tables.py
+
 rem Build executable
 pyinstaller child_growth_analyzer.spec
 
@@ -0,0 +1,18 @@
+"""
+Build the precomputed WHO reference tables loaded by who_data.
+
+Run this after updating the CSV files in who_data/ (and before packaging):
+    python build_who_tables.py
+
+Tables are built for every registered indicator whose CSV files are present.
+"""
+
+from who_data import INDICATORS, build_reference_artifact
+
+if __name__ == "__main__":
+    for key, indicator in INDICATORS.items():
+        if not indicator.has_source_files():
+            print(f"Skipping {indicator.label}: WHO CSV files not found")
+            continue
+        path = build_reference_artifact(indicator=key)
+        print(f"WHO {indicator.label} reference tables written to {path}")
@@ -1,4 +1,5 @@
 # -*- mode: python ; coding: utf-8 -*-
+import glob
 import PyInstaller.config
 PyInstaller.config.CONF['distpath'] = "dist"
 
@@ -10,14 +11,15 @@ a = Analysis(
     binaries=[],
     datas=[
         ('app_icon.ico', '.'),
-        ('who_data/hfa-boys-perc-who2007-exp.csv', 'who_data'),
-        ('who_data/hfa-girls-perc-who2007-exp.csv', 'who_data')
+    ] + [
+        # WHO reference tables of every indicator that has its data files
+        (path, 'who_data') for path in glob.glob('who_data/*.csv') + glob.glob('who_data/*.npz')
     ],
     hiddenimports=[
         'matplotlib.backends.backend_tkagg',
         'pandas',
         'numpy',
-        'scipy.interpolate'
+        'scipy.special'
     ],
     hookspath=[],
     hooksconfig={},
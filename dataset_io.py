@@ -0,0 +1,157 @@
+"""
+Reading and writing of Child Growth Analyzer dataset files
+
+File format (semicolon separated):
+    Birthdate;DD.MM.YYYY    (optional first row)
+    Age;Height;Date         (header; Date is optional)
+    1,5;82,3;12.05.2004     (data, decimal comma or dot)
+
+Date holds the measurement date (DD.MM.YYYY, or YYYY-MM-DD). When the file
+has a birthdate, the ages of dated rows are computed from the dates and the
+Age column may be left empty or omitted.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from instrumentation import span
+from measurement_store import DATE_FORMAT, ages_from_dates
+
+REQUIRED_COLUMNS = ['Age', 'Height']
+
+# Rows parsed at a time; bounds memory use for very large exports
+CHUNK_ROWS = 100_000
+
+
+def parse_birthdate_line(line):
+    """Return the birthdate from a 'Birthdate;DD.MM.YYYY' row, or None if the row is not one"""
+    if not line.strip().startswith('Birthdate'):
+        return None
+    try:
+        parts = line.strip().split(';')
+        birthdate = parts[1].strip()
+        # Validate date format
+        datetime.strptime(birthdate, "%d.%m.%Y")
+        return birthdate
+    except (ValueError, IndexError):
+        # Invalid birthdate format, treat as old format
+        return None
+
+
+def read_birthdate(f):
+    """Consume the optional birthdate row of a file opened in binary mode.
+
+    Returns the birthdate, or None after rewinding to the start of the file.
+    """
+    start = f.tell()
+    birthdate = parse_birthdate_line(f.readline().decode('utf-8'))
+    if birthdate is None:
+        f.seek(start)
+    return birthdate
+
+
+def _to_float(column):
+    """Numeric values of a parsed column; handles dot decimals and bad values"""
+    if not pd.api.types.is_numeric_dtype(column):
+        # Not parsed by the decimal=',' fast path (dot decimals or text)
+        column = pd.to_numeric(column.str.replace(',', '.', regex=False), errors='coerce')
+    return column.to_numpy(dtype=float)
+
+
+def _to_dates(column):
+    """datetime64[D] values of a parsed date column; NaT for empty or bad values"""
+    column = column.astype(str).str.strip()
+    dates = pd.to_datetime(column, format=DATE_FORMAT, errors='coerce')
+    missing = dates.isna()
+    if missing.any():
+        # ISO dates, as written by spreadsheets and databases
+        dates[missing] = pd.to_datetime(column[missing], format='%Y-%m-%d', errors='coerce')
+    return dates.to_numpy(dtype='datetime64[D]')
+
+
+def iter_dataset_chunks(f, chunksize=CHUNK_ROWS, birthdate=None):
+    """Parse the data rows of a dataset file in chunks.
+
+    `f` is a binary file positioned at the 'Age;Height' header (see
+    read_birthdate). Yields (ages, heights, dates) per chunk with rows
+    containing invalid numbers removed; dates is a datetime64[D] array, or
+    None if the file has no Date column. With a birthdate, the ages of
+    dated rows are computed from their dates. Raises ValueError if the
+    required columns are missing.
+    """
+    reader = pd.read_csv(f, sep=';', decimal=',', encoding='utf-8', chunksize=chunksize)
+    for chunk in reader:
+        # Validate columns (Age can be replaced by Date)
+        has_dates = 'Date' in chunk.columns
+        if 'Height' not in chunk.columns or not ('Age' in chunk.columns or has_dates):
+            raise ValueError(f"CSV file must contain 'Age' and 'Height' columns.\n"
+                             f"Found columns: {', '.join(map(str, chunk.columns))}")
+
+        heights = _to_float(chunk['Height'])
+        if 'Age' in chunk.columns:
+            ages = _to_float(chunk['Age'])
+        else:
+            ages = np.full(len(heights), np.nan)
+
+        if not has_dates:
+            valid = ~(np.isnan(ages) | np.isnan(heights))
+            yield ages[valid], heights[valid], None
+            continue
+
+        dates = _to_dates(chunk['Date'])
+        dated = ~np.isnat(dates)
+        if birthdate:
+            ages = np.where(dated, ages_from_dates(dates, birthdate), ages)
+
+        # Remove rows without a height or without both age and date
+        valid = ~np.isnan(heights) & (dated | ~np.isnan(ages))
+        yield ages[valid], heights[valid], dates[valid]
+
+
+def read_dataset(file_path, chunksize=CHUNK_ROWS, progress=None):
+    """Read a dataset CSV file.
+
+    Returns (DataFrame with numeric 'Age' and 'Height' columns, birthdate or None).
+    Files with a Date column also give a datetime64 'Date' column, with the
+    ages of dated rows computed from it when the birthdate is known (NaN
+    otherwise). The file is streamed in chunks, so only the parsed numbers
+    are held in memory. `progress`, if given, is called with the number of bytes read
+    after every chunk; an exception raised by it aborts the read. Raises
+    ValueError if the required columns are missing.
+    """
+    ages, heights, dates = [], [], []
+    with span('CSV parse', file=os.path.basename(file_path)), open(file_path, 'rb') as f:
+        birthdate = read_birthdate(f)
+        for chunk_ages, chunk_heights, chunk_dates in iter_dataset_chunks(f, chunksize, birthdate):
+            ages.append(chunk_ages)
+            heights.append(chunk_heights)
+            if chunk_dates is not None:
+                dates.append(chunk_dates)
+            if progress is not None:
+                progress(f.tell())
+
+    df = pd.DataFrame({
+        'Age': np.concatenate(ages) if ages else np.empty(0),
+        'Height': np.concatenate(heights) if heights else np.empty(0),
+    })
+    if dates:
+        df['Date'] = np.concatenate(dates)
+    return df, birthdate
+
+
+def write_dataset(file_path, ages, heights, birthdate=None, dates=None):
+    """Write a dataset CSV file, with the birthdate in the first row if available.
+
+    A Date column is written when any of the optional measurement `dates`
+    is known.
+    """
+    df = pd.DataFrame({'Age': ages, 'Height': heights}, copy=False)
+    if dates is not None and not np.isnat(dates).all():
+        df['Date'] = pd.Series(dates).dt.strftime(DATE_FORMAT).fillna('')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        if birthdate:
+            f.write(f"Birthdate;{birthdate}\n")
+        # Write the measurements
+        df.to_csv(f, sep=';', index=False)
@@ -0,0 +1,124 @@
+"""
+Background loading of dataset files
+
+Files are parsed on a small thread pool so the Tk main loop keeps running.
+Worker threads never touch Tk: they report progress through a shared byte
+counter and hand their results over a queue, which the main thread polls
+with root.after.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dataset_io import read_dataset
+
+# How often the main thread checks on the workers
+POLL_INTERVAL_MS = 50
+
+
+class LoadCancelled(Exception):
+    """Raised inside a worker to abort parsing after cancel()"""
+
+
+class DatasetLoader:
+    """Parse dataset files in the background and report back on the Tk thread.
+
+    `on_progress(fraction)` is called while loading and `on_finished(loader)`
+    once every file is done or the load was cancelled. Afterwards
+    `loader.results` holds (path, DataFrame, birthdate) tuples in the order
+    of `paths` and `loader.errors` holds (path, message) tuples.
+    """
+
+    def __init__(self, root, paths, on_finished, on_progress=None, workers=None):
+        self.root = root
+        self.paths = list(paths)
+        self.on_finished = on_finished
+        self.on_progress = on_progress
+        self.results = []
+        self.errors = []
+
+        self._sizes = {path: self._file_size(path) for path in self.paths}
+        self._bytes_read = dict.fromkeys(self.paths, 0)
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._done = queue.Queue()
+        self._outcomes = {}
+
+        workers = workers or min(len(self.paths), os.cpu_count() or 1, 4) or 1
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        for path in self.paths:
+            self._pool.submit(self._load, path)
+        self._pool.shutdown(wait=False)
+
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Stop parsing; files not yet finished are dropped"""
+        self._cancel.set()
+
+    def progress(self):
+        """Fraction of all bytes parsed so far"""
+        total = sum(self._sizes.values())
+        with self._lock:
+            done = sum(self._bytes_read.values())
+        return done / total if total else 0.0
+
+    def _load(self, path):
+        """Worker thread: parse one file and queue the outcome"""
+        def report(position):
+            if self._cancel.is_set():
+                raise LoadCancelled()
+            with self._lock:
+                self._bytes_read[path] = position
+
+        try:
+            if self._cancel.is_set():
+                raise LoadCancelled()
+            df, birthdate = read_dataset(path, progress=report)
+            outcome = (df, birthdate, None)
+        except LoadCancelled:
+            outcome = (None, None, "cancelled")
+        except Exception as e:
+            outcome = (None, None, str(e))
+        with self._lock:
+            self._bytes_read[path] = self._sizes[path]
+        self._done.put((path, outcome))
+
+    def _poll(self):
+        """Main thread: collect finished files and update the progress"""
+        while True:
+            try:
+                path, outcome = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._outcomes[path] = outcome
+
+        if self.on_progress is not None:
+            self.on_progress(self.progress())
+
+        # After cancel() the workers stop at their next chunk on their own
+        if len(self._outcomes) < len(self.paths) and not self.cancelled:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+            return
+
+        if not self.cancelled:
+            for path in self.paths:
+                df, birthdate, error = self._outcomes[path]
+                if error is None:
+                    self.results.append((path, df, birthdate))
+                else:
+                    self.errors.append((path, error))
+        self.on_finished(self)
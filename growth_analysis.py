@@ -0,0 +1,113 @@
+"""
+Growth velocity and percentile-channel analysis for many children at once
+
+All measurements of a cohort are sorted once by (child, age); every interval
+between two consecutive measurements of the same child then lies between
+neighbouring rows, so velocities, z-score changes and channel crossings are
+plain array differences. No per-child or per-row Python loop is involved.
+
+A child's percentile channel is the band between two of the major WHO chart
+lines (CHANNEL_PERCENTILES). A fall of more than FALTERING_Z_DROP in z-score
+between consecutive measurements (about one channel width) is flagged as
+growth faltering.
+
+numpy and the WHO tables are only imported by analyze_growth, so the table
+formatters below can be imported at startup.
+"""
+
+# Major percentile lines of the WHO charts; the bands between them are the channels
+CHANNEL_PERCENTILES = [3, 10, 25, 50, 75, 90, 97]
+
+# Fall in z-score between consecutive measurements flagged as growth faltering
+FALTERING_Z_DROP = 0.67
+
+
+def format_velocity(value):
+    """Growth velocity in cm/year, empty for a child's first measurement"""
+    return '' if value != value else f"{value:.1f}"
+
+
+def format_zscore_delta(value):
+    """Z-score change, marked when it counts as growth faltering"""
+    if value != value:
+        return ''
+    return f"{value:+.2f} ▼" if value < -FALTERING_Z_DROP else f"{value:+.2f}"
+
+
+def analyze_growth(child_ids, ages, heights, sexes='both', indicator='height'):
+    """Per-measurement growth analysis of a whole cohort in one vectorized pass.
+
+    `child_ids` holds one id per row (None: all rows are one child); the rows
+    of a child need not be contiguous or sorted by age. `sexes` is a single
+    string or one 'boys'/'girls'/'both' per row, as for
+    lms.calculate_zscores. Returns a dict of arrays in the input row order:
+
+        'zscore'        LMS z-score of the measurement
+        'channel'       percentile channel, 0 = below P3 ... 7 = above P97
+                        (-1 where the z-score is unknown)
+        'velocity'      growth since the child's previous measurement, per year
+        'zscore_delta'  z-score change since the previous measurement
+        'crossings'     channel lines crossed since the previous measurement,
+                        negative when falling
+        'faltering'     z-score fell by more than FALTERING_Z_DROP
+
+    The interval values are NaN (0, False) for each child's first measurement.
+    """
+    from statistics import NormalDist
+
+    import numpy as np
+    from lms import calculate_zscores
+
+    channel_zscores = [NormalDist().inv_cdf(p / 100) for p in CHANNEL_PERCENTILES]
+    ages = np.asarray(ages, dtype=float).ravel()
+    heights = np.asarray(heights, dtype=float).ravel()
+    sexes = np.broadcast_to(np.asarray(sexes, dtype=str), ages.shape)
+    if child_ids is None:
+        child_ids = np.zeros(len(ages), dtype=np.int8)
+    child_ids = np.asarray(child_ids).ravel()
+
+    order = np.lexsort((ages, child_ids))
+    ages, heights, child_ids = ages[order], heights[order], child_ids[order]
+    z = calculate_zscores(ages, heights, sexes[order], indicator)
+    known = ~np.isnan(z)
+    channel = np.where(known, np.searchsorted(channel_zscores, z), -1)
+
+    # Interval i runs from row i to row i + 1
+    same_child = child_ids[1:] == child_ids[:-1]
+    elapsed = np.diff(ages)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        velocity = np.where(same_child & (elapsed > 0), np.diff(heights) / elapsed, np.nan)
+    delta = np.where(same_child, np.diff(z), np.nan)
+    crossings = np.where(same_child & known[1:] & known[:-1], np.diff(channel), 0)
+    with np.errstate(invalid='ignore'):
+        faltering = delta < -FALTERING_Z_DROP
+
+    sorted_results = {
+        'zscore': z,
+        'channel': channel,
+        'velocity': np.concatenate([[np.nan], velocity]),
+        'zscore_delta': np.concatenate([[np.nan], delta]),
+        'crossings': np.concatenate([[0], crossings]),
+        'faltering': np.concatenate([[False], faltering]),
+    }
+    if len(ages) == 0:
+        sorted_results = {key: values[:0] for key, values in sorted_results.items()}
+
+    # Back to the input row order
+    results = {}
+    for key, values in sorted_results.items():
+        results[key] = np.empty_like(values)
+        results[key][order] = values
+    return results
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    # Dated measurements without a birthdate have NaN ages; they must not
+    # break the analysis of the other rows
+    results = analyze_growth(None, [6, np.nan, 7], [115, 118, 121], 'girls')
+    assert np.isnan(results['zscore'][1]) and results['channel'][1] == -1
+    assert np.isnan(results['velocity'][1]) and np.isnan(results['zscore_delta'][1])
+    assert not np.isnan(results['velocity'][2]) and not results['faltering'][1]
+    print(results)
@@ -0,0 +1,360 @@
+"""
+Growth chart drawing for the Child Growth Analyzer
+
+The chart keeps one scatter and one line artist per dataset and only updates
+the data of datasets that changed, instead of clearing and replotting the
+whole axes on every change. The tooltip is blitted on top of a cached
+background so hovering does not re-render the chart.
+
+The datasets changed last are animated as well: they are left out of the
+cached background and blitted on top of it, so further changes to them redraw
+only their own artists. A full draw is only needed when other datasets
+change or when the legend or the axis limits change.
+"""
+
+import numpy as np
+from matplotlib.ticker import FormatStrFormatter
+
+from hover_index import PointIndex
+from instrumentation import timed
+from who_data import PERCENTILE_KEYS, reference_curves
+
+REFERENCE_COLORS = {'boys': 'steelblue', 'girls': 'palevioletred'}
+
+
+class GrowthPlot:
+    """Persistent artists for the growth chart of one matplotlib figure."""
+
+    def __init__(self, fig, colors, hover_radius=10):
+        self.fig = fig
+        self.ax = fig.axes[0] if fig.axes else fig.add_subplot()
+        self.colors = colors
+        self.hover_radius = hover_radius  # pixels
+
+        self.artists = {}  # Format: {name: {'scatter': PathCollection, 'line': Line2D, 'bounds': (x0, x1, y0, y1)}}
+        self.legend_key = None
+        self._live = set()  # Names of the datasets whose artists are animated
+
+        # WHO reference curves: [(line, ages, heights)] with the full cached grid
+        self.reference_lines = []
+        self.ax.callbacks.connect('xlim_changed', self._clip_reference_curves)
+
+        # Nearest-point lookup for the tooltip, rebuilt when the datasets change
+        self.point_index = PointIndex()
+
+        # Growth faltering markers over all datasets (see set_growth_overlay)
+        self.overlay_sex = None
+        self.overlay = None
+
+        self.ax.set_xlabel("Age (years)")
+        self.ax.set_ylabel("Height (cm)")
+        self.ax.set_title("Child Growth Chart")
+        self.ax.grid(True)
+        # Grid under the data, so blitted datasets are layered as in a full draw
+        self.ax.set_axisbelow(True)
+
+        # Configure axis formatting
+        self.ax.xaxis.set_major_formatter(FormatStrFormatter('%.2f'))
+        self.ax.yaxis.set_major_formatter(FormatStrFormatter('%.0f'))
+
+        # Add tooltip annotation
+        self.annot = self.ax.annotate("", xy=(0,0), xytext=(10,10),
+                                      textcoords="offset points",
+                                      bbox=dict(boxstyle="round", fc="w", ec="0.5", alpha=0.9),
+                                      arrowprops=dict(arrowstyle="->"))
+        self.annot.set_visible(False)
+
+        # The tooltip is drawn by blitting only, on top of the cached background
+        self.annot.set_animated(getattr(fig.canvas, 'supports_blit', False))
+        self._background = None
+        self._legend_background = None
+        self._hovered = None  # (point index, gender) currently shown
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    @timed('plot refresh')
+    def update(self, store, changed=None):
+        """Bring the artists in line with the datasets of a MeasurementStore.
+
+        `changed` is an iterable of dataset names whose data changed; None
+        means every dataset may have changed. New and removed datasets are
+        always handled.
+        """
+        names = store.names()
+        # A refresh of everything is drawn in full, without animating any dataset
+        everything = relayout = changed is None
+        changed = set(names) if changed is None else set(changed)
+        limits = (self.ax.get_xlim(), self.ax.get_ylim())
+
+        # Remove artists of datasets that no longer exist
+        for name in [name for name in self.artists if name not in store]:
+            artists = self.artists.pop(name)
+            artists['scatter'].remove()
+            artists['line'].remove()
+            relayout = True
+
+        for i, name in enumerate(names):
+            color = self.colors[i % len(self.colors)]
+            artists = self.artists.get(name)
+            if artists is None:
+                artists = self.artists[name] = {
+                    'scatter': self.ax.scatter([], [], color=color, label=name),
+                    'line': self.ax.plot([], [], color=color, alpha=0.5)[0],
+                }
+                changed.add(name)
+                relayout = True
+            elif artists['line'].get_color() != color:
+                # Colors follow the dataset order, which shifts on removal
+                artists['scatter'].set_color(color)
+                artists['line'].set_color(color)
+                relayout = True
+
+            if name in changed:
+                self._set_dataset_data(artists, store.ages(name), store.heights(name))
+
+        relayout |= self._update_legend()
+        self._update_limits()
+        relayout |= (self.ax.get_xlim(), self.ax.get_ylim()) != limits
+        self._update_overlay(store)
+        self.point_index.rebuild(store)
+        self.annot.set_visible(False)
+        self._hovered = None
+        self._redraw(set() if everything else changed, relayout)
+
+    def _redraw(self, changed, relayout):
+        """Show a change of the datasets `changed`, blitting it if only their artists need redrawing"""
+        canvas = self.fig.canvas
+        if not getattr(canvas, 'supports_blit', False):
+            canvas.draw_idle()
+            return
+        changed = {name for name in changed if name in self.artists}
+        if relayout or self._background is None or not changed <= self._live:
+            # Take the changed datasets out of the background for the next changes
+            self._set_live(changed)
+            self._background = None
+            canvas.draw_idle()
+        else:
+            self._blit()
+
+    def _set_live(self, names):
+        """Animate the artists of the datasets `names`, and only those"""
+        for name, artists in self.artists.items():
+            artists['scatter'].set_animated(name in names)
+            artists['line'].set_animated(name in names)
+        self._live = set(names)
+
+    def savefig(self, *args, **kwargs):
+        """Save the figure with all datasets (animated artists are left out of saved files)"""
+        self._set_live(set())
+        if self.overlay is not None:
+            self.overlay.set_animated(False)
+        self._background = None
+        try:
+            self.fig.savefig(*args, **kwargs)
+        finally:
+            if self.overlay is not None:
+                self.overlay.set_animated(getattr(self.fig.canvas, 'supports_blit', False))
+            self.fig.canvas.draw_idle()
+
+    def _set_dataset_data(self, artists, ages, heights):
+        # Dated measurements have no age until the birthdate is known
+        placed = ~np.isnan(ages)
+        if not placed.all():
+            ages, heights = ages[placed], heights[placed]
+
+        # Plot scatter points
+        artists['scatter'].set_offsets(np.column_stack([ages, heights]))
+
+        # Sort by age for line plot
+        order = np.argsort(ages, kind='stable')
+        artists['line'].set_data(ages[order], heights[order])
+
+        if len(ages):
+            artists['bounds'] = (ages.min(), ages.max(), heights.min(), heights.max())
+        else:
+            artists['bounds'] = None
+
+    def set_growth_overlay(self, store, sex):
+        """Mark measurements reached by growth faltering, scored against `sex`; None hides the marks"""
+        self.overlay_sex = sex
+        self._update_overlay(store)
+        self.fig.canvas.draw_idle()
+
+    def _update_overlay(self, store):
+        if self.overlay_sex is None or len(store) == 0:
+            if self.overlay is not None:
+                self.overlay.set_offsets(np.empty((0, 2)))
+            return
+
+        # One pass over the shared columns of all datasets
+        from growth_analysis import analyze_growth
+        faltering = analyze_growth(store.dataset_id, store.age, store.height,
+                                   self.overlay_sex)['faltering']
+        if self.overlay is None:
+            self.overlay = self.ax.scatter([], [], marker='v', s=120, facecolors='none',
+                                           edgecolors='red', linewidths=1.5, zorder=3,
+                                           label='_growth_faltering')
+            # Follows every data change, so it is always blitted
+            self.overlay.set_animated(getattr(self.fig.canvas, 'supports_blit', False))
+        self.overlay.set_offsets(np.column_stack([store.age[faltering], store.height[faltering]]))
+
+    def set_reference_curves(self, sexes, percentile_keys):
+        """Show WHO percentile curves for `sexes` ('boys'/'girls') at `percentile_keys` (e.g. 'P3')"""
+        for line, _, _ in self.reference_lines:
+            line.remove()
+        self.reference_lines = []
+
+        for sex in sexes:
+            ages, heights = reference_curves(sex)
+            for j, key in enumerate(percentile_keys):
+                label = f"WHO {sex} ({', '.join(percentile_keys)})" if j == 0 else '_nolegend_'
+                line, = self.ax.plot([], [], color=REFERENCE_COLORS[sex], linewidth=1,
+                                     linestyle='-' if key == 'P50' else '--',
+                                     alpha=0.7, zorder=0.5, label=label)
+                self.reference_lines.append((line, ages, heights[:, PERCENTILE_KEYS.index(key)]))
+
+        self._update_legend()
+        self._update_limits()
+        self._clip_reference_curves(self.ax)
+        self._hovered = None
+        self.fig.canvas.draw_idle()
+
+    def _reference_slice(self, ages, x0, x1):
+        """Index range of the cached age grid covering [x0, x1]"""
+        lo = max(np.searchsorted(ages, x0, side='right') - 1, 0)
+        hi = np.searchsorted(ages, x1, side='left') + 1
+        return lo, hi
+
+    def _clip_reference_curves(self, ax):
+        """Restrict the reference curves to the visible age range (zoom and pan)"""
+        x0, x1 = sorted(ax.get_xlim())
+        for line, ages, heights in self.reference_lines:
+            lo, hi = self._reference_slice(ages, x0, x1)
+            line.set_data(ages[lo:hi], heights[lo:hi])
+
+    def _update_legend(self):
+        """Rebuild the legend if the shown datasets or curves changed; True if it did"""
+        key = (tuple(self.artists), tuple(line.get_label() for line, _, _ in self.reference_lines))
+        if key == self.legend_key:
+            return False
+        self.legend_key = key
+        if self.artists or self.reference_lines:
+            self.ax.legend()
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        return True
+
+    def _update_limits(self):
+        """Autoscale to the datasets (collections are not covered by ax.relim)"""
+        bounds = [a['bounds'] for a in self.artists.values() if a.get('bounds') is not None]
+        if bounds:
+            bounds = np.array(bounds)
+            x0, x1 = bounds[:, 0].min(), bounds[:, 1].max()
+            y0, y1 = bounds[:, 2].min(), bounds[:, 3].max()
+        elif self.reference_lines:
+            # No data yet: show the whole reference range
+            x0 = min(ages[0] for _, ages, _ in self.reference_lines)
+            x1 = max(ages[-1] for _, ages, _ in self.reference_lines)
+            y0, y1 = np.inf, -np.inf
+        else:
+            return
+
+        # Keep the reference curves within the shown age range visible
+        for _, ages, heights in self.reference_lines:
+            lo, hi = self._reference_slice(ages, x0, x1)
+            if hi > lo:
+                y0 = min(y0, heights[lo:hi].min())
+                y1 = max(y1, heights[lo:hi].max())
+
+        self.ax.set_xlim(*self._with_margin(x0, x1, self.ax.margins()[0]))
+        self.ax.set_ylim(*self._with_margin(y0, y1, self.ax.margins()[1]))
+
+    @staticmethod
+    def _with_margin(lo, hi, margin):
+        span = hi - lo
+        if span == 0:
+            span = abs(lo) * 0.1 or 1.0
+        return lo - span * margin, hi + span * margin
+
+    def tooltip_text(self, i, gender, calculate_percentiles):
+        """Tooltip text for point index i of the point index"""
+        dataset_name, age, height = self.point_index.point(i)
+
+        # Calculate WHO percentiles based on selected gender (cached per point)
+        percentiles = self.point_index.percentiles(i, gender, calculate_percentiles)
+
+        # Create tooltip text based on gender selection
+        text = [f"Dataset: {dataset_name}",
+                f"Age: {age:.2f} years",
+                f"Height: {height:.0f} cm",
+                f"WHO Percentiles:"]
+
+        if gender == "both":
+            text.extend([f"Boys: {percentiles['boys']}th",
+                         f"Girls: {percentiles['girls']}th"])
+        elif gender == "boys":
+            text.append(f"Boys: {percentiles['boys']}th")
+        else:  # girls
+            text.append(f"Girls: {percentiles['girls']}th")
+
+        return '\n'.join(text)
+
+    def _on_draw(self, event):
+        """Cache the freshly rendered chart and put the animated artists back on top"""
+        canvas = self.fig.canvas
+        if not getattr(canvas, 'supports_blit', False):
+            return
+        if getattr(canvas, '_is_saving', False):
+            # savefig renders at the file's dpi and size; keep the screen background
+            return
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        # The legend as laid out by this draw, pasted back over blitted datasets
+        # (laying it out again for the 'best' location costs as much as the data)
+        legend = self.ax.get_legend()
+        self._legend_background = None if legend is None else canvas.copy_from_bbox(
+            legend.legendPatch.get_window_extent().padded(1))
+        self._draw_animated()
+
+    def _draw_animated(self):
+        artists = [artist for name in self._live if name in self.artists
+                   for artist in (self.artists[name]['scatter'], self.artists[name]['line'])]
+        if self.overlay is not None and self.overlay.get_animated():
+            artists.append(self.overlay)
+        for artist in sorted(artists, key=lambda artist: artist.get_zorder()):
+            self.ax.draw_artist(artist)
+        if artists and self._legend_background is not None:
+            self.fig.canvas.restore_region(self._legend_background)
+        if self.annot.get_visible():
+            self.ax.draw_artist(self.annot)
+
+    def _blit(self):
+        canvas = self.fig.canvas
+        if self._background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        self._draw_animated()
+        canvas.blit(self.fig.bbox)
+
+    @timed('tooltip lookup')
+    def on_mouse_move(self, event, gender, calculate_percentiles):
+        """Show the tooltip for the point under the mouse, if any"""
+        closest = None
+        if event.inaxes is not None:
+            # Find the closest point within the hover radius (in screen pixels)
+            closest = self.point_index.nearest(self.ax, event.x, event.y, self.hover_radius)
+
+        # Nothing to redraw if the same point (or none) is still hovered
+        hovered = None if closest is None else (closest, gender)
+        if hovered == self._hovered:
+            return
+        self._hovered = hovered
+
+        if closest is not None:
+            _, age, height = self.point_index.point(closest)
+            self.annot.xy = (age, height)
+            self.annot.set_text(self.tooltip_text(closest, gender, calculate_percentiles))
+            self.annot.set_visible(True)
+        else:
+            self.annot.set_visible(False)
+
+        self._blit()
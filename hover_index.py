@@ -0,0 +1,81 @@
+"""
+Nearest-point index for the growth chart tooltip
+"""
+
+import numpy as np
+
+
+class PointIndex:
+    """Finds the plotted data point closest to the mouse, in screen pixels.
+
+    The point arrays are collected once per dataset change (rebuild). Their
+    pixel positions are cached per view and only recomputed when the axes
+    are zoomed, panned or resized. Points are kept sorted by their pixel x
+    coordinate so a lookup only inspects the points within the search radius
+    horizontally.
+    """
+
+    def __init__(self):
+        self.ages = np.empty(0)
+        self.heights = np.empty(0)
+        self.dataset_names = {}  # Format: {dataset id: name}
+        self.dataset_ids = np.empty(0, dtype=int)
+        self._view_key = None
+        self._order = None
+        self._pixel_x = None
+        self._pixel_y = None
+        self._percentiles = {}
+
+    def rebuild(self, store):
+        """Index the points of a MeasurementStore.
+
+        The store columns are used directly (no copy); rebuild must be called
+        again whenever the store changes.
+        """
+        self.ages = store.age
+        self.heights = store.height
+        self.dataset_ids = store.dataset_id
+        self.dataset_names = {store.id_of(name): name for name in store}
+        self._view_key = None
+        self._percentiles.clear()
+
+    def _update_pixels(self, ax):
+        view_key = (tuple(ax.viewLim.bounds), tuple(ax.bbox.bounds))
+        if view_key == self._view_key:
+            return
+        pixels = ax.transData.transform(np.column_stack([self.ages, self.heights]))
+        self._order = np.argsort(pixels[:, 0], kind='stable')
+        self._pixel_x = pixels[self._order, 0]
+        self._pixel_y = pixels[self._order, 1]
+        self._view_key = view_key
+
+    def nearest(self, ax, x, y, radius):
+        """Return the index of the point closest to pixel (x, y), or None.
+
+        Only points within `radius` pixels are considered.
+        """
+        if len(self.ages) == 0:
+            return None
+        self._update_pixels(ax)
+
+        lo = np.searchsorted(self._pixel_x, x - radius, side='left')
+        hi = np.searchsorted(self._pixel_x, x + radius, side='right')
+        if lo == hi:
+            return None
+
+        dist = np.hypot(self._pixel_x[lo:hi] - x, self._pixel_y[lo:hi] - y)
+        best = int(np.argmin(dist))
+        if dist[best] > radius:
+            return None
+        return int(self._order[lo + best])
+
+    def point(self, i):
+        """Return (dataset name, age, height) for point index i"""
+        return self.dataset_names[self.dataset_ids[i]], self.ages[i], self.heights[i]
+
+    def percentiles(self, i, gender, calculate):
+        """Return the WHO percentiles of point i, calling `calculate` once per point and gender"""
+        key = (i, gender)
+        if key not in self._percentiles:
+            self._percentiles[key] = calculate(self.ages[i], self.heights[i], gender)
+        return self._percentiles[key]
@@ -0,0 +1,143 @@
+"""
+Lightweight timing instrumentation for the Child Growth Analyzer
+
+Off by default. Set the CGA_PROFILE environment variable to turn it on:
+    CGA_PROFILE=1               print a summary of all spans on exit
+    CGA_PROFILE=trace.json      also write a Chrome trace (chrome://tracing,
+                                https://ui.perfetto.dev) to that file
+
+Code marks the work it does with spans:
+    with span('CSV parse', file=path):
+        ...
+
+    @timed('plot refresh')
+    def update(...):
+        ...
+
+When profiling is off, span() returns a shared no-op context manager and
+timed() returns the function unchanged, so instrumented code costs next to
+nothing.
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+_setting = os.environ.get('CGA_PROFILE', '').strip()
+ENABLED = _setting not in ('', '0')
+TRACE_FILE = _setting if ENABLED and _setting != '1' else None
+
+# Trace events kept for the Chrome trace; the summary counts every span
+MAX_TRACE_EVENTS = 100_000
+
+_origin = time.perf_counter()
+_lock = threading.Lock()
+_totals = {}   # Format: {name: [count, total seconds, max seconds]}
+_events = []   # Chrome trace 'complete' events
+
+
+class _NullSpan:
+    """Span used when profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as `name`; keyword args go into the trace"""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def timed(name):
+    """Decorator timing every call of a function as `name`"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, start, duration, args=None):
+    """Record a finished span (start from time.perf_counter, duration in seconds)"""
+    if not ENABLED:
+        return
+    with _lock:
+        totals = _totals.get(name)
+        if totals is None:
+            _totals[name] = [1, duration, duration]
+        else:
+            totals[0] += 1
+            totals[1] += duration
+            totals[2] = max(totals[2], duration)
+
+        if len(_events) < MAX_TRACE_EVENTS:
+            event = {'name': name, 'ph': 'X', 'pid': os.getpid(),
+                     'tid': threading.get_ident(),
+                     'ts': (start - _origin) * 1e6, 'dur': duration * 1e6}
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            _events.append(event)
+
+
+def summary():
+    """Table of count, total, mean and max time per span name, slowest total first"""
+    with _lock:
+        rows = sorted(_totals.items(), key=lambda item: item[1][1], reverse=True)
+    lines = [f"{'span':32s}{'count':>8s}{'total ms':>12s}{'mean ms':>11s}{'max ms':>11s}"]
+    for name, (count, total, longest) in rows:
+        lines.append(f"{name:32s}{count:8d}{total * 1000:12.2f}{total / count * 1000:11.3f}{longest * 1000:11.2f}")
+    return '\n'.join(lines)
+
+
+def write_chrome_trace(path):
+    """Write the recorded spans in the Chrome trace event format"""
+    with _lock:
+        events = list(_events)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def _report():
+    print("\nCGA_PROFILE timing summary:", file=sys.stderr)
+    print(summary(), file=sys.stderr)
+    if TRACE_FILE:
+        try:
+            write_chrome_trace(TRACE_FILE)
+            print(f"Chrome trace written to {TRACE_FILE}", file=sys.stderr)
+        except OSError as e:
+            print(f"Could not write Chrome trace: {e}", file=sys.stderr)
+
+
+if ENABLED:
+    atexit.register(_report)
@@ -0,0 +1,128 @@
+"""
+LMS z-scores for the WHO height-for-age reference (and the other indicators
+registered in who_data)
+
+Each month of the WHO tables is summarised by the Box-Cox power L, median M
+and coefficient of variation S, so that a height y at that age has the
+z-score
+
+    z = ((y / M) ** L - 1) / (L * S)      (L != 0)
+    z = ln(y / M) / S                     (L == 0)
+
+and the percentile 100 * Phi(z). Unlike the percentile-table interpolation
+this is continuous and does not clamp below P0.1 or above P99.9.
+
+The L, M, S values are fitted once from the tabulated percentiles (see
+fit_lms) and stored with the precomputed reference tables in who_data.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+# Candidate Box-Cox powers tried by fit_lms
+L_GRID = np.round(np.arange(-3.0, 3.0001, 0.05), 2)
+
+
+def fit_lms(percentile_values, table):
+    """Fit L, M, S for every row of a percentile table.
+
+    `percentile_values` are the tabulated percentiles (e.g. 3 for P3) and
+    `table` holds one row of heights per age. For each candidate L, y ** L is
+    linear in z with intercept M ** L and slope M ** L * L * S, so M and S
+    follow from a least squares line; the L with the smallest height error
+    is kept. Returns an array of shape (rows, 3) with columns L, M, S.
+    """
+    z = np.array([NormalDist().inv_cdf(p / 100) for p in percentile_values])
+    table = np.asarray(table, dtype=float)
+    z_centered = z - z.mean()
+
+    best_error = np.full(len(table), np.inf)
+    lms = np.zeros((len(table), 3))
+    for L in L_GRID:
+        transformed = np.log(table) if L == 0 else table ** L
+        slope = (transformed - transformed.mean(axis=1, keepdims=True)) @ z_centered / (z_centered @ z_centered)
+        intercept = transformed.mean(axis=1) - slope * z.mean()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if L == 0:
+                M = np.exp(intercept)
+                S = slope
+                predicted = M[:, None] * np.exp(S[:, None] * z)
+            else:
+                M = intercept ** (1 / L)
+                S = slope / (intercept * L)
+                predicted = M[:, None] * (1 + L * S[:, None] * z) ** (1 / L)
+            error = np.sum((predicted - table) ** 2, axis=1)
+        better = np.isfinite(error) & (error < best_error)
+        best_error[better] = error[better]
+        lms[better] = np.column_stack([np.full(len(table), L), M, S])[better]
+    return lms
+
+
+def lms_parameters(ages, sex, indicator='height'):
+    """Return L, M, S arrays at `ages` (years) for 'boys'/'male' or 'girls'/'female'.
+
+    Ages outside the reference range give NaN.
+    """
+    from who_data import get_reference_engine
+
+    return get_reference_engine(indicator).lms_parameters(ages, sex)
+
+
+def _zscores_for_sex(ages, heights, sex, indicator):
+    L, M, S = lms_parameters(ages, sex, indicator)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = heights / M
+        box_cox = np.where(np.abs(L) < 1e-6, np.log(ratio), (ratio ** L - 1) / np.where(L == 0, 1, L))
+        return box_cox / S
+
+
+def calculate_zscores(ages, heights, sexes, indicator='height'):
+    """Vectorized height-for-age z-scores (or z-scores of another indicator's measurements).
+
+    `sexes` is an array (or a single string) of 'boys'/'male', 'girls'/'female'
+    or 'both' per row; 'both' gives the mean of the boys and girls z-scores.
+    Ages outside the reference range give NaN.
+    """
+    ages = np.asarray(ages, dtype=float).ravel()
+    heights = np.asarray(heights, dtype=float).ravel()
+    sexes = np.broadcast_to(np.asarray(sexes, dtype=str), ages.shape)
+
+    is_both = sexes == 'both'
+    is_male = np.isin(sexes, ['male', 'boys'])
+    boys = _zscores_for_sex(ages, heights, 'boys', indicator) if (is_male | is_both).any() else None
+    girls = _zscores_for_sex(ages, heights, 'girls', indicator) if (~is_male).any() else None
+
+    z = np.full(ages.shape, np.nan)
+    if boys is not None:
+        z[is_male] = boys[is_male]
+    if girls is not None:
+        is_female = ~(is_male | is_both)
+        z[is_female] = girls[is_female]
+    if is_both.any():
+        z[is_both] = (boys[is_both] + girls[is_both]) / 2
+    return z
+
+
+def zscores_to_percentiles(z):
+    """Percentiles (0-100) for standard normal z-scores"""
+    from scipy.special import ndtr
+    return 100 * ndtr(z)
+
+
+def calculate_lms_percentiles(ages, heights, sexes, indicator='height'):
+    """Vectorized percentiles from the LMS z-scores (not rounded, not clamped).
+
+    'both' rows give the mean of the boys and girls percentiles, like
+    who_data.calculate_percentiles_batch.
+    """
+    ages = np.asarray(ages, dtype=float).ravel()
+    heights = np.asarray(heights, dtype=float).ravel()
+    sexes = np.broadcast_to(np.asarray(sexes, dtype=str), ages.shape)
+
+    is_both = sexes == 'both'
+    result = zscores_to_percentiles(calculate_zscores(ages, heights, np.where(is_both, 'boys', sexes), indicator))
+    if is_both.any():
+        girls = zscores_to_percentiles(calculate_zscores(ages[is_both], heights[is_both], 'girls', indicator))
+        result[is_both] = (result[is_both] + girls) / 2
+    return result
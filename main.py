@@ -1,15 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 import os
-import re
-from io import StringIO
 import ctypes
+import threading
 from datetime import datetime
-from who_data import create_percentile_interpolators, calculate_exact_percentile
+
+# Timing spans, enabled with the CGA_PROFILE environment variable
+from instrumentation import span
+
+# Table formatters; growth_analysis imports numpy only when analysing
+from growth_analysis import format_velocity, format_zscore_delta
+
+# pandas, matplotlib and who_data are imported where they are first used so
+# that the window can appear before the heavy libraries have been loaded
+
+
+def format_date(date):
+    """'DD.MM.YYYY' text of a datetime64[D] measurement date, empty if unknown"""
+    text = str(date)
+    return '' if text == 'NaT' else f"{text[8:10]}.{text[5:7]}.{text[:4]}"
+
 
 class ChildGrowthAnalyzer:
     def __init__(self, root):
@@ -78,23 +88,55 @@ class ChildGrowthAnalyzer:
         self.content_frame.grid_columnconfigure(1, weight=1)
         self.content_frame.grid_rowconfigure(0, weight=1)
         
-        # Data storage
-        self.datasets = {}  # Format: {name: {'df': DataFrame, 'birthdate': 'DD.MM.YYYY'}}
+        # Data storage: all datasets in one columnar MeasurementStore (see store)
+        self._store = None
         self.colors = ['red', 'blue', 'green', 'purple', 'orange']
         
+        self.plot_ready = False
+        
+        # Background dataset loading in progress (see start_loading)
+        self.loader = None
+        
+        # Session file the workspace was opened from or last saved to
+        self.session = None
+        
+        # SQLite database children were loaded from or saved to (see open_database)
+        self.database = None
+        
         # Create main containers
         self.setup_gui()
         
         # Update scroll region when content changes
         self.content_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
         
-        # Add WHO data interpolators
-        self.who_interpolators = create_percentile_interpolators()
+        # Build the chart once the window is on screen and warm up the
+        # WHO tables and pandas in the background meanwhile
+        self.root.after(10, self.create_plot_frame)
+        threading.Thread(target=self.warm_up, daemon=True).start()
+        
+    @property
+    def store(self):
+        """Measurements of all datasets, created on first access"""
+        if self._store is None:
+            from measurement_store import MeasurementStore
+            self._store = MeasurementStore()
+        return self._store
+    
+    def warm_up(self):
+        """Load the heavy modules and WHO tables off the main thread"""
+        try:
+            with span('import pandas'):
+                import pandas
+            # Loads the WHO tables for the tooltips (cached in who_data)
+            from who_data import get_reference_engine
+            get_reference_engine()
+        except Exception as e:
+            print(f"Background warm-up failed: {e}")
         
     def setup_gui(self):
         # Create main frames in content_frame instead of root
+        # (the plot frame is created after the window is shown)
         self.create_control_frame()
-        self.create_plot_frame()
         
     def create_control_frame(self):
         # Change parent to content_frame
@@ -105,7 +147,31 @@ class ChildGrowthAnalyzer:
         control_frame.grid_columnconfigure(8, weight=1)  # Row before exit button
         
         # File operations
-        ttk.Button(control_frame, text="Load Dataset", command=self.load_dataset).grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+        load_frame = ttk.Frame(control_frame)
+        load_frame.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+        self.load_button = ttk.Button(load_frame, text="Load Dataset", command=self.load_dataset)
+        self.load_button.pack(fill="x")
+        self.import_folder_button = ttk.Button(load_frame, text="Import Folder", command=self.import_folder)
+        self.import_folder_button.pack(fill="x", pady=(5, 0))
+        
+        # Whole sessions (all datasets and settings) in a single file
+        session_frame = ttk.Frame(load_frame)
+        session_frame.pack(fill="x", pady=(5, 0))
+        session_frame.grid_columnconfigure((0, 1), weight=1, uniform="session")
+        ttk.Button(session_frame, text="Open Session", command=self.open_session).grid(row=0, column=0, padx=(0, 2), sticky="ew")
+        ttk.Button(session_frame, text="Save Session", command=self.save_session).grid(row=0, column=1, padx=(2, 0), sticky="ew")
+        
+        # Optional SQLite database of many children; only selected children are loaded
+        ttk.Button(session_frame, text="Open Database", command=self.open_database).grid(row=1, column=0, padx=(0, 2), pady=(5, 0), sticky="ew")
+        ttk.Button(session_frame, text="Save to Database", command=self.save_to_database).grid(row=1, column=1, padx=(2, 0), pady=(5, 0), sticky="ew")
+        
+        # Progress of background loading, shown below the load button while loading
+        self.load_progress_frame = ttk.Frame(load_frame)
+        self.load_progress_var = tk.DoubleVar(value=0)
+        ttk.Progressbar(self.load_progress_frame, variable=self.load_progress_var,
+                        maximum=100).pack(side="left", fill="x", expand=True)
+        ttk.Button(self.load_progress_frame, text="Cancel",
+                   command=self.cancel_loading).pack(side="left", padx=(5, 0))
         ttk.Button(control_frame, text="Save Dataset", command=self.save_dataset).grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
         ttk.Button(control_frame, text="Clear All", command=self.clear_all).grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
         
@@ -117,54 +183,77 @@ class ChildGrowthAnalyzer:
                                   values=["both", "boys", "girls"],
                                   state="readonly")
         gender_combo.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
+        gender_combo.bind('<<ComboboxSelected>>', lambda e: self.on_gender_changed())
+        
+        # WHO reference percentile curves on the chart
+        ttk.Label(control_frame, text="Reference Curves:").grid(row=4, column=0, padx=5, pady=5)
+        self.reference_var = tk.StringVar(value="none")
+        reference_combo = ttk.Combobox(control_frame,
+                                     textvariable=self.reference_var,
+                                     values=["none", "both", "boys", "girls"],
+                                     state="readonly")
+        reference_combo.grid(row=4, column=1, padx=5, pady=5, sticky="ew")
+        reference_combo.bind('<<ComboboxSelected>>', lambda e: self.update_reference_curves())
+        
+        ttk.Label(control_frame, text="Reference Percentiles:").grid(row=5, column=0, padx=5, pady=5)
+        self.reference_percentiles_var = tk.StringVar(value="P3, P50, P97")
+        percentiles_combo = ttk.Combobox(control_frame,
+                                       textvariable=self.reference_percentiles_var,
+                                       values=["P3, P50, P97",
+                                               "P3, P10, P25, P50, P75, P90, P97",
+                                               "P1, P50, P99"],
+                                       state="readonly")
+        percentiles_combo.grid(row=5, column=1, padx=5, pady=5, sticky="ew")
+        percentiles_combo.bind('<<ComboboxSelected>>', lambda e: self.update_reference_curves())
         
         # Add Age Calculator section (adjust row numbers)
-        ttk.Label(control_frame, text="Age Calculator").grid(row=4, column=0, columnspan=2, pady=(20,5))
+        ttk.Label(control_frame, text="Age Calculator").grid(row=6, column=0, columnspan=2, pady=(20,5))
         
         self.age_result_var = tk.StringVar()
         self.age_result_var.set("Age: -- years (select a dataset)")
-        ttk.Label(control_frame, textvariable=self.age_result_var).grid(row=5, column=0, columnspan=2, padx=5, pady=5)
+        ttk.Label(control_frame, textvariable=self.age_result_var).grid(row=7, column=0, columnspan=2, padx=5, pady=5)
         
         # Separator
-        ttk.Separator(control_frame, orient='horizontal').grid(row=6, column=0, columnspan=2, sticky='ew', pady=10)
+        ttk.Separator(control_frame, orient='horizontal').grid(row=8, column=0, columnspan=2, sticky='ew', pady=10)
         
         # Dataset selection (adjust row numbers)
-        ttk.Label(control_frame, text="Active Dataset:").grid(row=7, column=0, padx=5, pady=5)
+        ttk.Label(control_frame, text="Active Dataset:").grid(row=9, column=0, padx=5, pady=5)
         self.dataset_combo = ttk.Combobox(control_frame, state='readonly')
-        self.dataset_combo.grid(row=7, column=1, padx=5, pady=5, sticky="ew")
+        self.dataset_combo.grid(row=9, column=1, padx=5, pady=5, sticky="ew")
         self.dataset_combo.bind('<<ComboboxSelected>>', lambda e: self.update_table_display())
         
         # Birthdate display and edit (adjust row numbers)
-        ttk.Label(control_frame, text="Birthdate:").grid(row=8, column=0, padx=5, pady=5)
+        ttk.Label(control_frame, text="Birthdate:").grid(row=10, column=0, padx=5, pady=5)
         self.birthdate_display = ttk.Label(control_frame, text="--")
-        self.birthdate_display.grid(row=8, column=1, padx=5, pady=5, sticky="w")
+        self.birthdate_display.grid(row=10, column=1, padx=5, pady=5, sticky="w")
         ttk.Button(control_frame, text="Edit Birthdate", 
-                  command=self.edit_birthdate).grid(row=8, column=1, padx=5, pady=5, sticky="e")
+                  command=self.edit_birthdate).grid(row=10, column=1, padx=5, pady=5, sticky="e")
         
         # Manual data entry (adjust row numbers)
-        ttk.Label(control_frame, text="Add New Data Point").grid(row=9, column=0, columnspan=2, pady=(20,5))
+        ttk.Label(control_frame, text="Add New Data Point").grid(row=11, column=0, columnspan=2, pady=(20,5))
         
-        ttk.Label(control_frame, text="Age (years):").grid(row=10, column=0, padx=5, pady=5)
+        ttk.Label(control_frame, text="Age (years):").grid(row=12, column=0, padx=5, pady=5)
         self.age_display_entry = ttk.Entry(control_frame, state='readonly')
-        self.age_display_entry.grid(row=10, column=1, padx=5, pady=5)
+        self.age_display_entry.grid(row=12, column=1, padx=5, pady=5)
         
-        ttk.Label(control_frame, text="Height (cm):").grid(row=11, column=0, padx=5, pady=5)
+        ttk.Label(control_frame, text="Height (cm):").grid(row=13, column=0, padx=5, pady=5)
         self.height_entry = ttk.Entry(control_frame)
-        self.height_entry.grid(row=11, column=1, padx=5, pady=5)
+        self.height_entry.grid(row=13, column=1, padx=5, pady=5)
         
         ttk.Button(control_frame, text="Add Data Point", 
-                  command=self.add_data_point).grid(row=12, column=0, columnspan=2, pady=10)
-        
-        # Data display (adjust row number)
-        self.tree = ttk.Treeview(control_frame, columns=("Age", "Height"), show="headings")
-        self.tree.heading("Age", text="Age (years)")
-        self.tree.heading("Height", text="Height (cm)")
-        self.tree.grid(row=13, column=0, columnspan=2, pady=10, sticky="nsew")
-        
-        # Scrollbar for treeview
-        scrollbar = ttk.Scrollbar(control_frame, orient="vertical", command=self.tree.yview)
-        scrollbar.grid(row=13, column=2, sticky="ns")
-        self.tree.configure(yscrollcommand=scrollbar.set)
+                  command=self.add_data_point).grid(row=14, column=0, columnspan=2, pady=10)
+        
+        # Data display (adjust row number); only the visible rows are
+        # rendered, click a column header to sort by it
+        from virtual_table import VirtualTable
+        self.table = VirtualTable(control_frame,
+                                  [("Age", "Age (years)", "{:.2f}"),
+                                   ("Height", "Height (cm)", "{:.0f}"),
+                                   ("Date", "Date", format_date),
+                                   ("Velocity", "cm/year", format_velocity),
+                                   ("ZDelta", "Δz", format_zscore_delta)],
+                                  sort_column="Age", column_width=80)
+        self.table.grid(row=15, column=0, columnspan=2, pady=10, sticky="nsew")
         
         # Create custom style for exit button (before creating the button)
         style = ttk.Style()
@@ -173,9 +262,16 @@ class ChildGrowthAnalyzer:
         # Exit button at bottom left with proper cleanup (same size as Load Dataset button)
         exit_button = ttk.Button(control_frame, text="Exit", 
                                   command=self.quit_app, style='Exit.TButton')
-        exit_button.grid(row=14, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+        exit_button.grid(row=16, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
         
     def create_plot_frame(self):
+        if self.plot_ready:
+            return
+        with span('import matplotlib'):
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from growth_plot import GrowthPlot
+        
         # Change parent to content_frame
         plot_frame = ttk.LabelFrame(self.content_frame, text="Growth Chart", padding="10")
         plot_frame.grid(row=0, column=1, padx=10, pady=5, sticky="nsew")
@@ -183,25 +279,26 @@ class ChildGrowthAnalyzer:
         # Simplify button frame to just save button
         ttk.Button(plot_frame, text="Save Plot as JPEG", 
                   command=self.save_plot).pack(pady=5)
+        self.growth_overlay_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(plot_frame, text="Mark growth faltering",
+                        variable=self.growth_overlay_var,
+                        command=self.update_growth_overlay).pack()
         
         # Create matplotlib figure
-        self.fig, self.ax = plt.subplots(figsize=(12, 8))
+        self.fig = Figure(figsize=(12, 8))
+        self.ax = self.fig.add_subplot()
         self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         
-        # Configure axis formatting
-        self.ax.xaxis.set_major_formatter(plt.FormatStrFormatter('%.2f'))
-        self.ax.yaxis.set_major_formatter(plt.FormatStrFormatter('%.0f'))
-        
-        # Add tooltip annotation
-        self.annot = self.ax.annotate("", xy=(0,0), xytext=(10,10),
-                                     textcoords="offset points",
-                                     bbox=dict(boxstyle="round", fc="w", ec="0.5", alpha=0.9),
-                                     arrowprops=dict(arrowstyle="->"))
-        self.annot.set_visible(False)
+        # Chart artists, updated in place when datasets change
+        self.plot = GrowthPlot(self.fig, self.colors)
+        self.plot_ready = True
+        self.update_reference_curves()
         
         # Connect mouse events
         self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
+        
+        self.canvas.draw_idle()
 
     def save_plot(self):
         file_path = filedialog.asksaveasfilename(
@@ -216,176 +313,179 @@ class ChildGrowthAnalyzer:
             self.last_used_directory = os.path.dirname(file_path)
             
             try:
-                self.fig.savefig(file_path, format='jpg', dpi=300, bbox_inches='tight')
+                self.plot.savefig(file_path, format='jpg', dpi=300, bbox_inches='tight')
                 messagebox.showinfo("Success", "Plot saved successfully")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save plot: {str(e)}")
 
-    def on_mouse_move(self, event):
-        if event.inaxes is None:
-            self.annot.set_visible(False)
-            self.canvas.draw_idle()
+    def update_reference_curves(self):
+        """Show the WHO percentile curves selected in the controls"""
+        if not self.plot_ready:
+            return  # applied when the chart is created
+        selection = self.reference_var.get()
+        sexes = {"none": [], "both": ["boys", "girls"]}.get(selection, [selection])
+        percentile_keys = [p.strip() for p in self.reference_percentiles_var.get().split(',')]
+        self.plot.set_reference_curves(sexes, percentile_keys)
+    
+    def update_growth_overlay(self):
+        """Mark measurements after a drop of more than one percentile channel"""
+        if not self.plot_ready:
             return
-        
-        # Find the closest point
-        min_dist = float('inf')
-        closest_point = None
-        closest_dataset = None
-        
-        for dataset_name, dataset_info in self.datasets.items():
-            df = dataset_info['df']
-            for _, row in df.iterrows():
-                dist = ((event.xdata - row['Age'])**2 + 
-                       (event.ydata - row['Height'])**2)**0.5
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_point = (row['Age'], row['Height'])
-                    closest_dataset = dataset_name
-        
-        if min_dist < 0.5:
-            self.annot.xy = closest_point
-            
-            # Calculate WHO percentiles based on selected gender
-            gender = self.gender_var.get()
-            percentiles = calculate_exact_percentile(closest_point[0], 
-                                                  closest_point[1], 
-                                                  self.who_interpolators,
-                                                  gender=gender)
-            
-            # Create tooltip text based on gender selection
-            text = [f"Dataset: {closest_dataset}",
-                   f"Age: {closest_point[0]:.2f} years",
-                   f"Height: {closest_point[1]:.0f} cm",
-                   f"WHO Percentiles:"]
-            
-            if gender == "both":
-                text.extend([f"Boys: {percentiles['boys']}th",
-                           f"Girls: {percentiles['girls']}th"])
-            elif gender == "boys":
-                text.append(f"Boys: {percentiles['boys']}th")
-            else:  # girls
-                text.append(f"Girls: {percentiles['girls']}th")
-            
-            self.annot.set_text('\n'.join(text))
-            self.annot.set_visible(True)
-        else:
-            self.annot.set_visible(False)
-            
-        self.canvas.draw_idle()
+        sex = self.gender_var.get() if self.growth_overlay_var.get() else None
+        self.plot.set_growth_overlay(self.store, sex)
+    
+    def on_gender_changed(self):
+        # The growth analysis scores against the selected standard
+        self.update_table_display()
+        self.update_growth_overlay()
+    
+    def calculate_percentiles(self, age, height, gender):
+        from who_data import cached_exact_percentile
+        return cached_exact_percentile(age, height, gender=gender)
+    
+    def on_mouse_move(self, event):
+        self.plot.on_mouse_move(event, self.gender_var.get(), self.calculate_percentiles)
 
     def load_dataset(self):
+        if self.loader is not None:
+            return  # a load is already running
         try:
             # Use last used directory instead of current directory
-            file_path = filedialog.askopenfilename(
+            file_paths = filedialog.askopenfilenames(
                 initialdir=self.last_used_directory,
-                title="Select CSV file",
+                title="Select CSV file(s)",
                 filetypes=[("CSV files", "*.csv")]
             )
             
-            if file_path:
+            if file_paths:
                 # Update last used directory
-                self.last_used_directory = os.path.dirname(file_path)
-                
-                try:
-                    # Read CSV with semicolon separator and show content for debugging
-                    print(f"Attempting to read file: {file_path}")
-                    
-                    # First read the file content to handle decimal delimiters
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                    
-                    # Check if first line contains birthdate
-                    birthdate = None
-                    data_start = 0
-                    
-                    if lines and lines[0].strip().startswith('Birthdate'):
-                        # Extract birthdate from first line (format: Birthdate;DD.MM.YYYY)
-                        try:
-                            parts = lines[0].strip().split(';')
-                            if len(parts) >= 2:
-                                birthdate = parts[1].strip()
-                                # Validate date format
-                                datetime.strptime(birthdate, "%d.%m.%Y")
-                            data_start = 1
-                        except (ValueError, IndexError):
-                            # Invalid birthdate format, treat as old format
-                            birthdate = None
-                            data_start = 0
-                    
-                    # Join remaining lines for processing
-                    content = ''.join(lines[data_start:])
-                    
-                    # Replace commas with dots in numbers
-                    # This regex looks for numbers with commas and replaces the comma with a dot
-                    content = re.sub(r'(\d+),(\d+)', r'\1.\2', content)
-                    
-                    # Convert the modified content to a StringIO object for pandas
-                    df = pd.read_csv(StringIO(content), sep=';', encoding='utf-8')
-                    
-                    print("DataFrame loaded:")
-                    print(df.head())
-                    
-                    # Convert columns to numeric, forcing conversion of string numbers
-                    df['Age'] = pd.to_numeric(df['Age'], errors='coerce')
-                    df['Height'] = pd.to_numeric(df['Height'], errors='coerce')
-                    
-                    # Remove any rows with invalid numbers
-                    df = df.dropna()
-                    
-                    # Validate columns
-                    required_columns = ['Age', 'Height']
-                    if not all(col in df.columns for col in required_columns):
-                        messagebox.showerror("Error", 
-                            f"CSV file must contain 'Age' and 'Height' columns.\nFound columns: {', '.join(df.columns)}")
-                        return
-                    
-                    # Extract filename without extension as default dataset name
-                    default_name = os.path.splitext(os.path.basename(file_path))[0]
-                    
-                    # Ask for dataset name with default value
-                    dataset_name = simpledialog.askstring("Dataset Name", 
-                        "Enter a name for this dataset:",
-                        initialvalue=default_name,
-                        parent=self.root)
-                    
-                    if dataset_name:
-                        if dataset_name in self.datasets:
-                            if not messagebox.askyesno("Warning", 
-                                f"Dataset '{dataset_name}' already exists. Do you want to replace it?"):
-                                return
-                        
-                        # If no birthdate found, ask user for it
-                        if birthdate is None:
-                            birthdate = simpledialog.askstring("Birthdate", 
-                                f"Enter birthdate for {dataset_name} (DD.MM.YYYY):",
-                                parent=self.root)
-                            if birthdate:
-                                try:
-                                    datetime.strptime(birthdate, "%d.%m.%Y")
-                                except ValueError:
-                                    messagebox.showerror("Error", "Invalid date format. Please use DD.MM.YYYY")
-                                    birthdate = None
-                        
-                        # Store dataset with birthdate
-                        self.datasets[dataset_name] = {
-                            'df': df,
-                            'birthdate': birthdate
-                        }
-                        self.update_dataset_combo()
-                        self.update_display()
-                        messagebox.showinfo("Success", f"Dataset '{dataset_name}' loaded successfully with {len(df)} data points")
-                        
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to load CSV: {str(e)}\n\nPlease ensure the file:\n"
-                                       f"1. Uses semicolons (;) as separators\n"
-                                       f"2. Has 'Age' and 'Height' columns\n"
-                                       f"3. Contains valid numeric values (using either , or . as decimal separator)")
-                    print(f"Error details: {str(e)}")
+                self.last_used_directory = os.path.dirname(file_paths[0])
+                self.start_loading(file_paths, interactive=len(file_paths) == 1)
                     
         except Exception as e:
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
             print(f"Error details: {str(e)}")
     
+    def import_folder(self):
+        """Load every CSV file of a folder, named after the files, without any prompts"""
+        if self.loader is not None:
+            return  # a load is already running
+        folder = filedialog.askdirectory(
+            initialdir=self.last_used_directory,
+            title="Select folder with CSV files"
+        )
+        if not folder:
+            return
+        self.last_used_directory = folder
+        
+        import glob
+        file_paths = sorted(glob.glob(os.path.join(folder, '*.csv')))
+        if not file_paths:
+            messagebox.showerror("Error", f"No CSV files found in {folder}")
+            return
+        self.start_loading(file_paths, interactive=False)
+    
+    def start_loading(self, file_paths, interactive=True):
+        """Parse the files in the background; on_datasets_loaded runs when done.
+        
+        With `interactive` (a single file) the user is asked for the dataset
+        name and missing birthdate, otherwise the file names are used.
+        """
+        from dataset_loader import DatasetLoader
+        
+        self.load_button.state(['disabled'])
+        self.import_folder_button.state(['disabled'])
+        self.load_progress_var.set(0)
+        self.load_progress_frame.pack(fill="x", pady=(5, 0))
+        self.loader = DatasetLoader(self.root, file_paths,
+                                    on_finished=lambda loader: self.on_datasets_loaded(loader, interactive),
+                                    on_progress=lambda fraction: self.load_progress_var.set(100 * fraction))
+    
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancel()
+    
+    def on_datasets_loaded(self, loader, interactive):
+        self.load_progress_frame.pack_forget()
+        self.load_button.state(['!disabled'])
+        self.import_folder_button.state(['!disabled'])
+        self.loader = None
+        if loader.cancelled:
+            return
+        
+        if interactive and len(loader.results) == 1:
+            self.add_loaded_dataset(*loader.results[0])
+        elif loader.results:
+            self.add_loaded_datasets(loader.results)
+        
+        if loader.errors:
+            failed = '\n'.join(f"{os.path.basename(path)}: {message}" for path, message in loader.errors)
+            for path, message in loader.errors:
+                print(f"Error details for {path}: {message}")
+            messagebox.showerror("Error", f"Failed to load CSV:\n{failed}\n\nPlease ensure the file:\n"
+                               f"1. Uses semicolons (;) as separators\n"
+                               f"2. Has 'Age' and 'Height' columns\n"
+                               f"3. Contains valid numeric values (using either , or . as decimal separator)")
+    
+    def add_loaded_dataset(self, file_path, df, birthdate):
+        """Ask for the name (and birthdate if missing) of one loaded file and store it"""
+        # Extract filename without extension as default dataset name
+        default_name = os.path.splitext(os.path.basename(file_path))[0]
+        
+        # Ask for dataset name with default value
+        dataset_name = simpledialog.askstring("Dataset Name", 
+            "Enter a name for this dataset:",
+            initialvalue=default_name,
+            parent=self.root)
+        
+        if dataset_name:
+            if dataset_name in self.store:
+                if not messagebox.askyesno("Warning", 
+                    f"Dataset '{dataset_name}' already exists. Do you want to replace it?"):
+                    return
+            
+            # If no birthdate found, ask user for it
+            if birthdate is None:
+                birthdate = simpledialog.askstring("Birthdate", 
+                    f"Enter birthdate for {dataset_name} (DD.MM.YYYY):",
+                    parent=self.root)
+                if birthdate:
+                    try:
+                        datetime.strptime(birthdate, "%d.%m.%Y")
+                    except ValueError:
+                        messagebox.showerror("Error", "Invalid date format. Please use DD.MM.YYYY")
+                        birthdate = None
+            
+            # Store dataset with birthdate
+            self.store.add_dataset(dataset_name, df['Age'], df['Height'], birthdate, df.get('Date'))
+            self.update_dataset_combo()
+            self.update_display(changed=[dataset_name])
+            messagebox.showinfo("Success", f"Dataset '{dataset_name}' loaded successfully with {len(df)} data points")
+    
+    def add_loaded_datasets(self, results):
+        """Store several loaded files at once, named after their files, with one refresh"""
+        named = [(os.path.splitext(os.path.basename(path))[0], df, birthdate)
+                 for path, df, birthdate in results]
+        
+        existing = [name for name, _, _ in named if name in self.store]
+        if existing and not messagebox.askyesno("Warning",
+                f"{len(existing)} of these datasets already exist. Do you want to replace them?"):
+            named = [item for item in named if item[0] not in existing]
+        
+        for dataset_name, df, birthdate in named:
+            self.store.add_dataset(dataset_name, df['Age'], df['Height'], birthdate, df.get('Date'))
+        if not named:
+            return
+        
+        self.update_dataset_combo()
+        self.update_display(changed=[name for name, _, _ in named])
+        
+        missing = sum(1 for _, _, birthdate in named if birthdate is None)
+        message = f"Loaded {len(named)} datasets with {sum(len(df) for _, df, _ in named)} data points"
+        if missing:
+            message += f"\n\n{missing} datasets have no birthdate; use 'Edit Birthdate' to set it"
+        messagebox.showinfo("Success", message)
+    
     def save_dataset(self):
         dataset_name = self.dataset_combo.get()
         if not dataset_name:
@@ -404,24 +504,211 @@ class ChildGrowthAnalyzer:
             self.last_used_directory = os.path.dirname(file_path)
             
             try:
-                dataset_info = self.datasets[dataset_name]
-                df = dataset_info['df']
-                birthdate = dataset_info.get('birthdate', None)
+                birthdate = self.store.get_birthdate(dataset_name)
                 
                 # Write birthdate in first row if available
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    if birthdate:
-                        f.write(f"Birthdate;{birthdate}\n")
-                    # Write the dataframe
-                    df.to_csv(f, sep=';', index=False)
+                from dataset_io import write_dataset
+                write_dataset(file_path, self.store.ages(dataset_name),
+                              self.store.heights(dataset_name), birthdate,
+                              self.store.dates(dataset_name))
                 
                 messagebox.showinfo("Success", f"Dataset '{dataset_name}' saved successfully")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save dataset: {str(e)}")
     
+    def session_settings(self):
+        """Selections and view state saved with a session"""
+        settings = {
+            'gender': self.gender_var.get(),
+            'reference_curves': self.reference_var.get(),
+            'reference_percentiles': self.reference_percentiles_var.get(),
+            'active_dataset': self.dataset_combo.get(),
+            'table_sort': [self.table.sort_column, self.table.descending],
+        }
+        if self.plot_ready:
+            settings['view'] = {'xlim': list(self.ax.get_xlim()), 'ylim': list(self.ax.get_ylim())}
+            settings['growth_overlay'] = self.growth_overlay_var.get()
+        return settings
+    
+    def apply_session_settings(self, settings):
+        self.gender_var.set(settings.get('gender', self.gender_var.get()))
+        self.reference_var.set(settings.get('reference_curves', self.reference_var.get()))
+        self.reference_percentiles_var.set(settings.get('reference_percentiles', self.reference_percentiles_var.get()))
+        if 'table_sort' in settings:
+            self.table.sort_column, self.table.descending = settings['table_sort']
+        
+        self.update_dataset_combo()
+        if settings.get('active_dataset') in self.store:
+            self.dataset_combo.set(settings['active_dataset'])
+        self.update_display()
+        self.update_reference_curves()
+        self.growth_overlay_var.set(settings.get('growth_overlay', False))
+        self.update_growth_overlay()
+        
+        # Restore the zoom last, the updates above autoscale the chart
+        view = settings.get('view')
+        if view:
+            self.ax.set_xlim(*view['xlim'])
+            self.ax.set_ylim(*view['ylim'])
+            self.canvas.draw_idle()
+    
+    def open_session(self):
+        if self.store.names() and not messagebox.askyesno("Confirm", 
+                "Opening a session replaces all current datasets. Continue?"):
+            return
+        
+        file_path = filedialog.askopenfilename(
+            initialdir=self.last_used_directory,
+            title="Open session",
+            filetypes=[("Child Growth Analyzer sessions", "*.cgsession")]
+        )
+        if not file_path:
+            return
+        self.last_used_directory = os.path.dirname(file_path)
+        
+        try:
+            from session_file import SessionFile
+            session = SessionFile(file_path)
+            settings = session.load(self.store)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open session: {str(e)}")
+            return
+        
+        self.session = session
+        self.apply_session_settings(settings)
+    
+    def save_session(self):
+        """Save all datasets and settings; after the first save only changed datasets are written"""
+        if self.session is None:
+            file_path = filedialog.asksaveasfilename(
+                initialdir=self.last_used_directory,
+                defaultextension=".cgsession",
+                filetypes=[("Child Growth Analyzer sessions", "*.cgsession")],
+                initialfile="session.cgsession"
+            )
+            if not file_path:
+                return
+            self.last_used_directory = os.path.dirname(file_path)
+            from session_file import SessionFile
+            self.session = SessionFile(file_path)
+        
+        try:
+            self.session.save(self.store, self.session_settings())
+            messagebox.showinfo("Success", f"Session saved to {os.path.basename(self.session.path)}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save session: {str(e)}")
+    
+    def connect_database(self, file_path):
+        from sqlite_store import MeasurementDatabase
+        if self.database is not None:
+            if self.database.path == file_path:
+                return
+            self.database.close()
+        self.database = None
+        self.database = MeasurementDatabase(file_path)
+    
+    def open_database(self):
+        """Load selected children from an SQLite database"""
+        file_path = filedialog.askopenfilename(
+            initialdir=self.last_used_directory,
+            title="Open database",
+            filetypes=[("SQLite databases", "*.sqlite *.db"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        self.last_used_directory = os.path.dirname(file_path)
+        
+        names = []
+        try:
+            self.connect_database(file_path)
+            names = self.choose_children()
+            if not names:
+                return
+            self.database.load_children(names, self.store)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load from database: {str(e)}")
+        finally:
+            # Show the children loaded before any error as well
+            loaded = [name for name in names if name in self.store]
+            if loaded:
+                self.update_dataset_combo()
+                self.dataset_combo.set(loaded[0])
+                self.update_display(changed=loaded)
+    
+    def choose_children(self):
+        """Let the user pick children of the open database; returns their names"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Select Children")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        ttk.Label(dialog, text="Filter by name:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(dialog, textvariable=filter_var)
+        filter_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        
+        listbox = tk.Listbox(dialog, selectmode="extended", width=50, height=20)
+        listbox.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
+        scrollbar = ttk.Scrollbar(dialog, orient="vertical", command=listbox.yview)
+        scrollbar.grid(row=1, column=2, sticky="ns")
+        listbox.configure(yscrollcommand=scrollbar.set)
+        dialog.grid_rowconfigure(1, weight=1)
+        dialog.grid_columnconfigure(1, weight=1)
+        
+        shown = []
+        def refresh(*args):
+            # The filter runs as a query, the children are not all kept in memory
+            shown[:] = self.database.children(filter_var.get().strip())
+            listbox.delete(0, tk.END)
+            for name, birthdate, count in shown:
+                listbox.insert(tk.END, f"{name}  ({birthdate or 'no birthdate'}, {count} points)")
+        filter_var.trace_add('write', refresh)
+        refresh()
+        
+        selected = []
+        def load():
+            selected.extend(shown[i][0] for i in listbox.curselection())
+            dialog.destroy()
+        buttons = ttk.Frame(dialog)
+        buttons.grid(row=2, column=0, columnspan=3, pady=5)
+        ttk.Button(buttons, text="Load Selected", command=load).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Cancel", command=dialog.destroy).pack(side="left", padx=5)
+        
+        filter_entry.focus_set()
+        self.root.wait_window(dialog)
+        return selected
+    
+    def save_to_database(self):
+        """Save all datasets to the open (or a new) SQLite database; unchanged children are skipped"""
+        if not self.store.names():
+            messagebox.showerror("Error", "There are no datasets to save")
+            return
+        if self.database is None:
+            file_path = filedialog.asksaveasfilename(
+                initialdir=self.last_used_directory,
+                defaultextension=".sqlite",
+                filetypes=[("SQLite databases", "*.sqlite *.db")],
+                initialfile="children.sqlite"
+            )
+            if not file_path:
+                return
+            self.last_used_directory = os.path.dirname(file_path)
+        else:
+            file_path = self.database.path
+        
+        try:
+            self.connect_database(file_path)
+            written = self.database.save_children(self.store)
+            messagebox.showinfo("Success", f"Saved {len(self.store.names())} datasets to "
+                                f"{os.path.basename(file_path)} ({written} with new measurements)")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save to database: {str(e)}")
+    
     def clear_all(self):
         if messagebox.askyesno("Confirm", "Are you sure you want to clear all datasets?"):
-            self.datasets.clear()
+            self.store.clear()
+            # Start a new session; the next Save Session asks for a file
+            self.session = None
             self.birthdate_display.config(text="--")
             self.update_dataset_combo()
             self.update_display()
@@ -433,8 +720,7 @@ class ChildGrowthAnalyzer:
             messagebox.showerror("Error", "Please select a dataset")
             return
         
-        dataset_info = self.datasets[dataset_name]
-        current_birthdate = dataset_info.get('birthdate', '')
+        current_birthdate = self.store.get_birthdate(dataset_name) or ''
         
         new_birthdate = simpledialog.askstring("Edit Birthdate", 
             f"Enter birthdate for {dataset_name} (DD.MM.YYYY):",
@@ -445,9 +731,10 @@ class ChildGrowthAnalyzer:
             try:
                 # Validate date format
                 datetime.strptime(new_birthdate, "%d.%m.%Y")
-                dataset_info['birthdate'] = new_birthdate
+                # Ages of dated measurements are recomputed from the new birthdate
+                self.store.set_birthdate(dataset_name, new_birthdate)
                 # Update display and recalculate age
-                self.update_table_display()
+                self.update_display(changed=[dataset_name])
             except ValueError:
                 messagebox.showerror("Error", "Invalid date format. Please use DD.MM.YYYY")
     
@@ -457,55 +744,52 @@ class ChildGrowthAnalyzer:
             messagebox.showerror("Error", "Please select a dataset")
             return
         
-        dataset_info = self.datasets[dataset_name]
-        birthdate = dataset_info.get('birthdate', None)
+        birthdate = self.store.get_birthdate(dataset_name)
         
         if not birthdate:
             messagebox.showerror("Error", "Please set a birthdate for this dataset first")
             return
         
         try:
-            # Calculate age automatically from birthdate
-            from datetime import datetime
-            birth_date = datetime.strptime(birthdate, "%d.%m.%Y")
-            current_date = datetime.now()
-            age_days = (current_date - birth_date).days
-            age = age_days / 365.25  # Account for leap years
+            # Calculate age automatically from birthdate, and keep the date
+            # so the age follows later birthdate corrections
+            from measurement_store import ages_from_dates, today
+            date = today()
+            age = float(ages_from_dates([date], birthdate)[0])
             
             # Get height from user input
             height = float(self.height_entry.get())
             
-            new_data = pd.DataFrame({'Age': [age], 'Height': [height]})
-            dataset_info['df'] = pd.concat([dataset_info['df'], new_data], 
-                                          ignore_index=True)
+            # Appending to the store is amortized O(1)
+            self.store.append(dataset_name, age, height, date)
             
             # Clear only height entry (age is auto-calculated)
             self.height_entry.delete(0, tk.END)
             
-            self.update_display()
+            self.update_display(changed=[dataset_name])
             
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid height value")
     
     def update_dataset_combo(self):
         current = self.dataset_combo.get()
-        self.dataset_combo['values'] = list(self.datasets.keys())
-        if current in self.datasets:
+        names = self.store.names()
+        self.dataset_combo['values'] = names
+        if current in self.store:
             self.dataset_combo.set(current)
-        elif self.datasets:
-            self.dataset_combo.set(list(self.datasets.keys())[0])
+        elif names:
+            self.dataset_combo.set(names[0])
     
     def update_table_display(self):
         """Update only the table view based on selected dataset"""
-        # Clear existing items
-        self.tree.delete(*self.tree.get_children())
-        
+        with span('table refresh'):
+            self._update_table_display()
+    
+    def _update_table_display(self):
         # Get selected dataset
         dataset_name = self.dataset_combo.get()
-        if dataset_name and dataset_name in self.datasets:
-            dataset_info = self.datasets[dataset_name]
-            df = dataset_info['df']
-            birthdate = dataset_info.get('birthdate', None)
+        if dataset_name and dataset_name in self.store:
+            birthdate = self.store.get_birthdate(dataset_name)
             
             # Update birthdate display
             if birthdate:
@@ -516,56 +800,36 @@ class ChildGrowthAnalyzer:
             # Automatically calculate and update age
             self.calculate_age()
             
-            # Sort by age before displaying
-            df_sorted = df.sort_values('Age')
-            for _, row in df_sorted.iterrows():
-                self.tree.insert("", "end", values=(f"{row['Age']:.2f}", f"{row['Height']:.0f}"))
+            # Velocity and z-score change since the previous measurement
+            from growth_analysis import analyze_growth
+            ages = self.store.ages(dataset_name)
+            heights = self.store.heights(dataset_name)
+            growth = analyze_growth(None, ages, heights, self.gender_var.get())
+            
+            # The table sorts the rows itself (by age unless a header was clicked)
+            self.table.set_data({'Age': ages,
+                                 'Height': heights,
+                                 'Date': self.store.dates(dataset_name),
+                                 'Velocity': growth['velocity'],
+                                 'ZDelta': growth['zscore_delta']})
+        else:
+            self.table.clear()
 
-    def update_display(self):
+    def update_display(self, changed=None):
+        """Update table and plot; `changed` limits the plot update to these dataset names"""
         # Update table
         self.update_table_display()
         
-        # Update plot
-        self.ax.clear()
+        # Make sure the chart exists even if the deferred setup has not run yet
+        self.create_plot_frame()
         
-        # Plot each dataset with different colors
-        for i, (name, dataset_info) in enumerate(self.datasets.items()):
-            df = dataset_info['df']
-            color = self.colors[i % len(self.colors)]
-            
-            # Plot scatter points
-            self.ax.scatter(df['Age'], df['Height'], color=color, label=name)
-            
-            # Sort by age for line plot
-            df_sorted = df.sort_values('Age')
-            
-            # Plot connecting line
-            self.ax.plot(df_sorted['Age'], df_sorted['Height'], 
-                        color=color, alpha=0.5)
-        
-        self.ax.set_xlabel("Age (years)")
-        self.ax.set_ylabel("Height (cm)")
-        self.ax.set_title("Child Growth Chart")
-        self.ax.grid(True)
-        self.ax.legend()
-        
-        # Format axis
-        self.ax.xaxis.set_major_formatter(plt.FormatStrFormatter('%.2f'))
-        self.ax.yaxis.set_major_formatter(plt.FormatStrFormatter('%.0f'))
-        
-        # Recreate the annotation after clearing the plot
-        self.annot = self.ax.annotate("", xy=(0,0), xytext=(10,10),
-                                     textcoords="offset points",
-                                     bbox=dict(boxstyle="round", fc="w", ec="0.5", alpha=0.9),
-                                     arrowprops=dict(arrowstyle="->"))
-        self.annot.set_visible(False)
-        
-        self.canvas.draw()
+        # Update plot
+        self.plot.update(self.store, changed=changed)
 
     def calculate_age(self):
         """Calculate age automatically from the selected dataset's birthdate"""
         dataset_name = self.dataset_combo.get()
-        if not dataset_name or dataset_name not in self.datasets:
+        if not dataset_name or dataset_name not in self.store:
             self.age_result_var.set("Age: -- years (select a dataset)")
             self.age_display_entry.config(state='normal')
             self.age_display_entry.delete(0, tk.END)
@@ -573,8 +837,7 @@ class ChildGrowthAnalyzer:
             self.age_display_entry.config(state='readonly')
             return
         
-        dataset_info = self.datasets[dataset_name]
-        birthdate = dataset_info.get('birthdate', None)
+        birthdate = self.store.get_birthdate(dataset_name)
         
         if not birthdate:
             self.age_result_var.set("Age: -- years (birthdate not set)")
@@ -585,16 +848,10 @@ class ChildGrowthAnalyzer:
             return
         
         try:
-            from datetime import datetime
-            
-            # Parse birthdate
-            birth_date = datetime.strptime(birthdate, "%d.%m.%Y")
-            # Use current date
-            current_date = datetime.now()
+            from measurement_store import ages_from_dates, today
             
-            # Calculate age
-            age_days = (current_date - birth_date).days
-            age_years = age_days / 365.25  # Account for leap years
+            # Age today, computed the same way as the ages of dated measurements
+            age_years = float(ages_from_dates([today()], birthdate)[0])
             
             # Update result with 2 decimal places
             self.age_result_var.set(f"Age: {age_years:.2f} years")
@@ -615,8 +872,12 @@ class ChildGrowthAnalyzer:
     def quit_app(self):
         """Properly close the application"""
         try:
-            # Close matplotlib figure to prevent memory leaks
-            plt.close(self.fig)
+            # Release matplotlib figure to prevent memory leaks
+            if self.plot_ready:
+                self.fig.clear()
+            
+            if self.database is not None:
+                self.database.close()
             
             # Destroy the main window
             self.root.quit()
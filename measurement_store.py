@@ -0,0 +1,254 @@
+"""
+Columnar in-memory store for the measurements of all loaded datasets
+
+All datasets share four contiguous columns (age, height, measurement date,
+dataset id) that grow by doubling, so appending a measurement is amortized
+O(1) and memory stays proportional to the number of measurements. Each
+dataset keeps the row numbers of its measurements, which gives cheap
+per-dataset views.
+
+Measurement dates are optional (NaT when unknown). Rows with a date get
+their age from the date and the dataset's birthdate, so correcting a
+birthdate recomputes those ages in one vectorized step.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+DATE_FORMAT = "%d.%m.%Y"
+DAYS_PER_YEAR = 365.25
+
+
+def birthdate_to_datetime64(birthdate):
+    """datetime64[D] of a 'DD.MM.YYYY' birthdate"""
+    return np.datetime64(datetime.strptime(birthdate, DATE_FORMAT).date(), 'D')
+
+
+def today():
+    """Today's date as datetime64[D]"""
+    return np.datetime64('today', 'D')
+
+
+def ages_from_dates(dates, birthdate):
+    """Ages in years at the given datetime64 dates for a 'DD.MM.YYYY' birthdate (NaN where NaT)"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    days = (dates - birthdate_to_datetime64(birthdate)).astype(float)
+    days[np.isnat(dates)] = np.nan
+    return days / DAYS_PER_YEAR
+
+
+class _RowList:
+    """Growable int array of row numbers"""
+
+    def __init__(self, rows=None):
+        rows = np.empty(0, dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        self._rows = np.empty(max(len(rows), 8), dtype=np.int64)
+        self._rows[:len(rows)] = rows
+        self.count = len(rows)
+
+    def append(self, row):
+        if self.count == len(self._rows):
+            self._rows = np.concatenate([self._rows, np.empty(len(self._rows), dtype=np.int64)])
+        self._rows[self.count] = row
+        self.count += 1
+
+    @property
+    def rows(self):
+        return self._rows[:self.count]
+
+
+class MeasurementStore:
+    """Measurements of all datasets, stored column-wise.
+
+    Datasets are identified by name and kept in insertion order. Per-dataset
+    arrays returned by ages()/heights() are copies; the shared columns
+    returned by the age/height/dataset_id properties are views that are only
+    valid until the store is next modified.
+    """
+
+    def __init__(self, capacity=1024):
+        self._age = np.empty(capacity)
+        self._height = np.empty(capacity)
+        self._date = np.empty(capacity, dtype='datetime64[D]')
+        self._dataset_id = np.empty(capacity, dtype=np.int32)
+        self._size = 0
+        self._ids = {}        # Format: {name: dataset id}, in insertion order
+        self._datasets = {}   # Format: {dataset id: {'name': str, 'birthdate': 'DD.MM.YYYY', 'rows': _RowList, 'revision': int}}
+        self._next_id = 0
+        self._revision = 0    # bumped on every change of measurements
+
+    # Shared columns
+
+    @property
+    def age(self):
+        return self._age[:self._size]
+
+    @property
+    def height(self):
+        return self._height[:self._size]
+
+    @property
+    def date(self):
+        return self._date[:self._size]
+
+    @property
+    def dataset_id(self):
+        return self._dataset_id[:self._size]
+
+    def __len__(self):
+        """Total number of measurements"""
+        return self._size
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._age):
+            return
+        capacity = max(needed, 2 * len(self._age))
+        for attr in ('_age', '_height', '_date', '_dataset_id'):
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+    # Datasets
+
+    def names(self):
+        """Dataset names in insertion order"""
+        return list(self._ids)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def id_of(self, name):
+        return self._ids[name]
+
+    def name_of(self, dataset_id):
+        return self._datasets[dataset_id]['name']
+
+    def add_dataset(self, name, ages, heights, birthdate=None, dates=None):
+        """Add a dataset, replacing any existing dataset with the same name (keeping its position).
+
+        `dates` are optional measurement dates (anything convertible to
+        datetime64[D], NaT where unknown); with a birthdate, the ages of
+        dated rows are derived from them.
+        """
+        ages = np.array(ages, dtype=float).ravel()
+        heights = np.asarray(heights, dtype=float).ravel()
+        if dates is None:
+            dates = np.full(len(ages), np.datetime64('NaT'), dtype='datetime64[D]')
+        else:
+            dates = np.asarray(dates, dtype='datetime64[D]').ravel()
+        if not len(ages) == len(heights) == len(dates):
+            raise ValueError("ages, heights and dates must have the same length")
+        if birthdate:
+            dated = ~np.isnat(dates)
+            ages[dated] = ages_from_dates(dates[dated], birthdate)
+
+        if name in self._ids:
+            dataset_id = self._ids[name]
+            self._remove_rows(dataset_id)
+        else:
+            dataset_id = self._next_id
+            self._next_id += 1
+            self._ids[name] = dataset_id
+
+        self._reserve(len(ages))
+        start, end = self._size, self._size + len(ages)
+        self._age[start:end] = ages
+        self._height[start:end] = heights
+        self._date[start:end] = dates
+        self._dataset_id[start:end] = dataset_id
+        self._size = end
+        self._revision += 1
+        self._datasets[dataset_id] = {
+            'name': name,
+            'birthdate': birthdate,
+            'rows': _RowList(np.arange(start, end)),
+            'revision': self._revision,
+        }
+
+    def append(self, name, age, height, date=None):
+        """Append one measurement, optionally with its date, to an existing dataset"""
+        dataset_id = self._ids[name]
+        self._reserve(1)
+        row = self._size
+        self._age[row] = age
+        self._height[row] = height
+        self._date[row] = np.datetime64('NaT') if date is None else np.datetime64(date, 'D')
+        self._dataset_id[row] = dataset_id
+        self._size += 1
+        self._datasets[dataset_id]['rows'].append(row)
+        self._revision += 1
+        self._datasets[dataset_id]['revision'] = self._revision
+
+    def remove_dataset(self, name):
+        dataset_id = self._ids.pop(name)
+        self._remove_rows(dataset_id)
+        del self._datasets[dataset_id]
+
+    def clear(self):
+        self._size = 0
+        self._ids.clear()
+        self._datasets.clear()
+
+    def _remove_rows(self, dataset_id):
+        """Compact the columns without the rows of one dataset"""
+        keep = self.dataset_id != dataset_id
+        count = int(keep.sum())
+        for attr in ('_age', '_height', '_date', '_dataset_id'):
+            column = getattr(self, attr)
+            column[:count] = column[:self._size][keep]
+        self._size = count
+        self._datasets[dataset_id]['rows'] = _RowList()
+
+        # Row numbers of the remaining datasets have shifted
+        ids = self.dataset_id
+        order = np.argsort(ids, kind='stable')
+        starts = np.searchsorted(ids[order], list(self._datasets), side='left')
+        ends = np.searchsorted(ids[order], list(self._datasets), side='right')
+        for other_id, start, end in zip(self._datasets, starts, ends):
+            if other_id != dataset_id:
+                self._datasets[other_id]['rows'] = _RowList(order[start:end])
+
+    # Per-dataset access
+
+    def rows(self, name):
+        """Row numbers of a dataset in the shared columns"""
+        return self._datasets[self._ids[name]]['rows'].rows
+
+    def ages(self, name):
+        return self._age[self.rows(name)]
+
+    def heights(self, name):
+        return self._height[self.rows(name)]
+
+    def dates(self, name):
+        """Measurement dates of a dataset as datetime64[D], NaT where unknown"""
+        return self._date[self.rows(name)]
+
+    def count(self, name):
+        return self._datasets[self._ids[name]]['rows'].count
+
+    def revision(self, name):
+        """Number that changes whenever the measurements of a dataset change"""
+        return self._datasets[self._ids[name]]['revision']
+
+    def get_birthdate(self, name):
+        return self._datasets[self._ids[name]]['birthdate']
+
+    def set_birthdate(self, name, birthdate):
+        """Set the birthdate and recompute the ages of all dated measurements"""
+        dataset = self._datasets[self._ids[name]]
+        dataset['birthdate'] = birthdate
+        if not birthdate:
+            return
+        rows = dataset['rows'].rows
+        rows = rows[~np.isnat(self._date[rows])]
+        if len(rows):
+            self._age[rows] = ages_from_dates(self._date[rows], birthdate)
+            self._revision += 1
+            dataset['revision'] = self._revision
@@ -0,0 +1,188 @@
+"""
+WHO reference tables on their full monthly grid
+
+The WHO CSVs list every percentile for every month of age. The engine keeps
+them as one contiguous (months x percentiles) array per sex and looks ages
+up with index arithmetic: the fractional row is age * 12 - first month, and
+heights are linearly interpolated between the two neighbouring months. No
+splines have to be fitted or evaluated.
+
+An engine is immutable once built and safe to share between threads. Its
+tables can be published into a multiprocessing.shared_memory block so that
+worker processes attach to them without loading or copying them.
+"""
+
+import threading
+
+import numpy as np
+
+
+def interpolate_months(table, first_month, ages):
+    """Linearly interpolate the rows of a monthly table at `ages` (years).
+
+    Returns an array of shape (n, columns); ages outside the table and NaN
+    ages give NaN rows.
+    """
+    position = np.asarray(ages, dtype=float).ravel() * 12 - first_month
+    last = len(table) - 1
+    valid = (position >= 0) & (position <= last)
+    # Invalid positions (including NaN) look up row 0 and are masked below
+    position = np.where(valid, position, 0)
+    i = np.minimum(position, last - 1).astype(int)
+    weight = (position - i)[:, None]
+    values = table[i] + weight * (table[i + 1] - table[i])
+    values[~valid] = np.nan
+    return values
+
+
+class MonthlyCurve:
+    """One percentile column of a monthly table, callable like an interpolator.
+
+    Accepts scalars or arrays of ages in years and raises ValueError for ages
+    outside the table range, like the scipy interpolators it replaces; NaN
+    ages give NaN.
+    """
+
+    def __init__(self, first_month, column):
+        self.first_month = first_month
+        self.column = column
+
+    @property
+    def age_range(self):
+        return self.first_month / 12, (self.first_month + len(self.column) - 1) / 12
+
+    def __call__(self, age):
+        last = len(self.column) - 1
+        if isinstance(age, (int, float)) and 0 <= age * 12 - self.first_month <= last:
+            # Fast path for single ages (tooltips, calculate_exact_percentile)
+            position = age * 12 - self.first_month
+            i = min(int(position), last - 1)
+            return self.column[i] + (position - i) * (self.column[i + 1] - self.column[i])
+
+        age = np.asarray(age, dtype=float)
+        position = age * 12 - self.first_month
+        if np.any(position < 0):
+            raise ValueError(f"A value in x_new is below the interpolation range's minimum value ({self.age_range[0]}).")
+        if np.any(position > last):
+            raise ValueError(f"A value in x_new is above the interpolation range's maximum value ({self.age_range[1]}).")
+        unknown = np.isnan(position)
+        position = np.where(unknown, 0, position)
+        i = np.minimum(position.astype(int), last - 1)
+        weight = position - i
+        values = self.column[i] + weight * (self.column[i + 1] - self.column[i])
+        return np.where(unknown, np.nan, values)[()]
+
+
+class ReferenceEngine:
+    """Monthly WHO percentile tables for boys and girls.
+
+    `tables` maps 'boys' and 'girls' to {'months': ..., 'percentiles': ...,
+    'lms': ...} with consecutive whole months, one column per percentile and
+    the L, M, S columns of the LMS fit.
+    """
+
+    def __init__(self, tables):
+        self.first_month = {}
+        self.percentiles = {}
+        self.lms = {}
+        self._interpolators = None
+        self._interpolators_lock = threading.Lock()
+        self._shared_memory = None  # keeps an attached block mapped
+        for sex, data in tables.items():
+            months = np.asarray(data['months'], dtype=float)
+            if len(months) < 2 or not np.all(np.diff(months) == 1):
+                raise ValueError(f"WHO {sex} table must have one row per month")
+            table = np.ascontiguousarray(data['percentiles'], dtype=float)
+            table.flags.writeable = False
+            self.first_month[sex] = int(months[0])
+            self.percentiles[sex] = table
+            if 'lms' in data:
+                lms = np.ascontiguousarray(data['lms'], dtype=float)
+                lms.flags.writeable = False
+                self.lms[sex] = lms
+
+    @staticmethod
+    def _sex_key(sex):
+        return 'boys' if sex in ['male', 'boys'] else 'girls'
+
+    def age_range(self, sex=None):
+        """(min, max) age in years covered by one sex, or by both if sex is None"""
+        sexes = [self._sex_key(sex)] if sex else list(self.percentiles)
+        starts = [self.first_month[s] / 12 for s in sexes]
+        ends = [(self.first_month[s] + len(self.percentiles[s]) - 1) / 12 for s in sexes]
+        return max(starts), min(ends)
+
+    def percentile_heights(self, ages, sex):
+        """Heights at every tabulated percentile for each age: array of shape (n, percentiles).
+
+        Ages outside the table give NaN rows.
+        """
+        sex = self._sex_key(sex)
+        return interpolate_months(self.percentiles[sex], self.first_month[sex], ages)
+
+    def lms_parameters(self, ages, sex):
+        """L, M, S arrays at each age; ages outside the table give NaN"""
+        sex = self._sex_key(sex)
+        values = interpolate_months(self.lms[sex], self.first_month[sex], ages)
+        return values[:, 0], values[:, 1], values[:, 2]
+
+    def interpolators(self):
+        """({percentile key: MonthlyCurve} for boys, same for girls)"""
+        from who_data import PERCENTILE_KEYS
+
+        if self._interpolators is None:
+            with self._interpolators_lock:
+                if self._interpolators is None:
+                    self._interpolators = tuple(
+                        {key: MonthlyCurve(self.first_month[sex], self.percentiles[sex][:, i])
+                         for i, key in enumerate(PERCENTILE_KEYS)}
+                        for sex in ('boys', 'girls')
+                    )
+        return self._interpolators
+
+    def publish(self):
+        """Copy the tables into a new shared memory block.
+
+        Returns (SharedMemory, handle). The handle is a small picklable dict
+        to pass to attach() in other processes. The publisher owns the
+        block: call close() and unlink() on it once the workers are done.
+        """
+        from multiprocessing import shared_memory
+
+        layout = {}
+        arrays = []
+        offset = 0
+        for sex in self.percentiles:
+            layout[sex] = {'first_month': self.first_month[sex]}
+            tables = {'percentiles': self.percentiles[sex]}
+            if sex in self.lms:
+                tables['lms'] = self.lms[sex]
+            for name, table in tables.items():
+                layout[sex][name] = (offset, table.shape)
+                arrays.append((offset, table))
+                offset += table.nbytes
+
+        block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for start, table in arrays:
+            np.ndarray(table.shape, dtype=float, buffer=block.buf, offset=start)[:] = table
+        return block, {'name': block.name, 'layout': layout}
+
+    @classmethod
+    def attach(cls, handle):
+        """Engine over tables published by publish() in another process, without copying them"""
+        from multiprocessing import shared_memory
+
+        block = shared_memory.SharedMemory(name=handle['name'])
+        tables = {}
+        for sex, layout in handle['layout'].items():
+            first_month = layout['first_month']
+            tables[sex] = {}
+            for name in ('percentiles', 'lms'):
+                if name in layout:
+                    start, shape = layout[name]
+                    tables[sex][name] = np.ndarray(shape, dtype=float, buffer=block.buf, offset=start)
+            tables[sex]['months'] = np.arange(first_month, first_month + len(tables[sex]['percentiles']))
+
+        engine = cls(tables)
+        engine._shared_memory = block
+        return engine
@@ -0,0 +1,425 @@
+"""
+Local HTTP service for WHO height-for-age percentile scoring
+
+Loads the WHO reference tables once at startup and scores measurements
+sent by other programs (e.g. an EHR integration). Standard library only
+(asyncio), plus the numpy/pandas the rest of the application uses.
+
+Usage:
+    python -m scoring_service [--host 127.0.0.1] [--port 8765]
+
+Endpoints:
+    POST /score         one measurement
+    POST /score/batch   many measurements; results are streamed back
+    GET  /health        liveness check
+    GET  /stats         request, row and batch counters
+
+Request bodies are JSON or CSV (Content-Type application/json or text/csv):
+    {"age": 3.5, "height": 100, "sex": "boys"}
+    [{"age": 3.5, "height": 100, "sex": "boys"}, ...]
+    {"age": [3.5, 4.0], "height": [100, 103], "sex": "girls"}
+
+    Age;Height;Sex
+    3,5;100;boys
+
+Ages are in years, heights in cm, sex is boys/male, girls/female or both
+(the default; the mean of both percentiles). Responses use the format
+asked for in the Accept header, otherwise the format of the request.
+Ages outside the WHO range score as null (JSON) or empty (CSV).
+
+Concurrent requests are coalesced: all measurements waiting when the
+scorer becomes free (up to --max-batch rows) are scored with one
+vectorized call, so throughput grows with the load instead of paying a
+per-request cost.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import sys
+
+import numpy as np
+
+SEXES = {'boys', 'male', 'girls', 'female', 'both'}
+
+# Rows per streamed chunk of a batch response
+STREAM_ROWS = 10_000
+MAX_BODY_BYTES = 256 * 1024 * 1024
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """Invalid request; reported to the client with the given status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def score_measurements(ages, heights, sexes):
+    """Percentiles for arrays of ages, heights and sexes; NaN outside the WHO age range"""
+    from who_data import (calculate_percentiles_batch, create_percentile_interpolators,
+                          reference_age_range)
+
+    min_age, max_age = reference_age_range()
+    in_range = (ages >= min_age) & (ages <= max_age)
+    result = np.full(len(ages), np.nan)
+    if in_range.any():
+        result[in_range] = calculate_percentiles_batch(ages[in_range], heights[in_range],
+                                                       sexes[in_range],
+                                                       create_percentile_interpolators())
+    return result
+
+
+class ScoringBatcher:
+    """Coalesces scoring requests of concurrent clients into shared batches.
+
+    Scoring runs in a worker thread so the event loop keeps accepting
+    requests; whatever arrives meanwhile forms the next batch. `max_delay`
+    (seconds) is how long a batch waits for more requests after the first.
+    """
+
+    def __init__(self, max_rows=16_384, max_delay=0.001):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self._queue = asyncio.Queue()
+
+    async def score(self, ages, heights, sexes):
+        """Percentile array for one request, scored together with other pending requests"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((ages, heights, sexes, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            rows = len(items[0][0])
+            deadline = loop.time() + self.max_delay
+            while rows < self.max_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                items.append(item)
+                rows += len(item[0])
+
+            ages, heights, sexes = (np.concatenate([item[i] for item in items]) for i in range(3))
+            try:
+                result = await loop.run_in_executor(None, score_measurements, ages, heights, sexes)
+            except Exception as e:
+                for *_, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.requests += len(items)
+            self.rows += rows
+            self.batches += 1
+            start = 0
+            for item_ages, _, _, future in items:
+                if not future.done():
+                    future.set_result(result[start:start + len(item_ages)])
+                start += len(item_ages)
+
+
+# Request parsing
+
+def _columns(ages, heights, sexes):
+    """Validated (ages, heights, sexes) arrays"""
+    try:
+        ages = np.asarray(ages, dtype=float).ravel()
+        heights = np.asarray(heights, dtype=float).ravel()
+    except (TypeError, ValueError):
+        raise RequestError("age and height must be numbers")
+    if len(ages) != len(heights):
+        raise RequestError("age and height must have the same length")
+    sexes = np.asarray(sexes, dtype=str).ravel()
+    sexes = np.char.lower(np.broadcast_to(sexes, ages.shape) if sexes.size == 1 else sexes)
+    if len(sexes) != len(ages):
+        raise RequestError("sex must be a single value or one per measurement")
+    unknown = set(np.unique(sexes).tolist()) - SEXES
+    if unknown:
+        raise RequestError(f"Unknown sex: {', '.join(sorted(unknown))} "
+                           f"(use boys, male, girls, female or both)")
+    return ages, heights, sexes
+
+
+def parse_json(body):
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise RequestError(f"Invalid JSON: {e}")
+    try:
+        if isinstance(data, list):
+            return _columns([row['age'] for row in data], [row['height'] for row in data],
+                            [row.get('sex', 'both') for row in data] or 'both')
+        if isinstance(data, dict):
+            return _columns(data['age'], data['height'], data.get('sex', 'both'))
+    except KeyError as e:
+        raise RequestError(f"Missing field: {e.args[0]}")
+    except (TypeError, AttributeError):
+        raise RequestError("Expected measurement objects with age, height and sex")
+    raise RequestError("Expected a measurement object, a list of them, or columns of values")
+
+
+def parse_csv(body):
+    """Semicolon separated Age;Height[;Sex] with a header row, like the dataset files"""
+    import pandas as pd
+    from dataset_io import _to_float
+
+    try:
+        df = pd.read_csv(io.BytesIO(body), sep=';', decimal=',', dtype={'Sex': str})
+    except (ValueError, pd.errors.ParserError) as e:
+        raise RequestError(f"Invalid CSV: {e}")
+    df.columns = [str(column).strip().capitalize() for column in df.columns]
+    if 'Age' not in df.columns or 'Height' not in df.columns:
+        raise RequestError("CSV must contain 'Age' and 'Height' columns")
+    sexes = df['Sex'].fillna('both').str.strip() if 'Sex' in df.columns else 'both'
+    return _columns(_to_float(df['Age']), _to_float(df['Height']),
+                    sexes if isinstance(sexes, str) else sexes.to_numpy(dtype=str))
+
+
+# Response formatting
+
+def _json_number(value):
+    """JSON has no NaN or infinity; missing and invalid numbers become null"""
+    return value if math.isfinite(value) else None
+
+
+def _json_rows(ages, heights, sexes, percentiles):
+    return [{'age': _json_number(age), 'height': _json_number(height), 'sex': sex,
+             'percentile': _json_number(percentile)}
+            for age, height, sex, percentile in zip(ages.tolist(), heights.tolist(),
+                                                    sexes.tolist(), percentiles.tolist())]
+
+
+def _csv_rows(ages, heights, sexes, percentiles):
+    return ''.join(f"{age};{height};{sex};{'' if percentile != percentile else percentile}\n"
+                   for age, height, sex, percentile in zip(ages.tolist(), heights.tolist(),
+                                                           sexes.tolist(), percentiles.tolist()))
+
+
+CSV_HEADER = "Age;Height;Sex;Percentile\n"
+
+
+class ScoringServer:
+    """HTTP/1.1 front end of a ScoringBatcher"""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self._streaming = set()  # writers with a chunked response under way
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._send_error(writer, RequestError("Malformed request line"))
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+                try:
+                    body = await self._read_body(reader, headers)
+                except RequestError as e:
+                    # The body is still in the stream; the connection cannot be reused
+                    await self._send_error(writer, e)
+                    break
+                try:
+                    await self.dispatch(method, target.split('?')[0], headers, body, writer)
+                except RequestError as e:
+                    if writer in self._streaming:
+                        break  # the 200 status line is already out; drop the connection
+                    await self._send_error(writer, e)
+                except Exception as e:
+                    print(f"Scoring request failed: {e}", file=sys.stderr)
+                    if writer not in self._streaming:
+                        await self._send_error(writer, RequestError("Internal error", 500))
+                    break
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._streaming.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _read_body(reader, headers):
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise RequestError("Chunked request bodies are not supported; send Content-Length", 411)
+        length = headers.get('content-length', '').strip() or '0'
+        # Digits only: int() would also accept signs, spaces and underscores
+        if not (length.isascii() and length.isdigit()):
+            raise RequestError(f"Invalid Content-Length: {length}")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise RequestError("Request body too large", 413)
+        return await reader.readexactly(length) if length else b''
+
+    async def dispatch(self, method, path, headers, body, writer):
+        routes = {'/score': self.score_single, '/score/batch': self.score_batch,
+                  '/health': self.health, '/stats': self.stats}
+        handler = routes.get(path)
+        if handler is None:
+            raise RequestError(f"Unknown endpoint {path}", 404)
+        expected = 'GET' if path in ('/health', '/stats') else 'POST'
+        if method != expected:
+            raise RequestError(f"Use {expected} for {path}", 405)
+        await handler(headers, body, writer)
+
+    @staticmethod
+    def _formats(headers):
+        """(request format, response format): 'json' or 'csv'"""
+        content_type = headers.get('content-type', 'application/json').lower()
+        request_format = 'csv' if 'csv' in content_type else 'json'
+        accept = headers.get('accept', '').lower()
+        if 'csv' in accept:
+            return request_format, 'csv'
+        if 'json' in accept:
+            return request_format, 'json'
+        return request_format, request_format
+
+    async def health(self, headers, body, writer):
+        await self._send(writer, 200, 'application/json', b'{"status": "ok"}')
+
+    async def stats(self, headers, body, writer):
+        stats = {'requests': self.batcher.requests, 'rows': self.batcher.rows,
+                 'batches': self.batcher.batches}
+        await self._send(writer, 200, 'application/json', json.dumps(stats).encode())
+
+    async def score_single(self, headers, body, writer):
+        request_format, response_format = self._formats(headers)
+        ages, heights, sexes = parse_csv(body) if request_format == 'csv' else parse_json(body)
+        if len(ages) != 1:
+            raise RequestError("/score takes exactly one measurement; use /score/batch")
+        percentiles = await self.batcher.score(ages, heights, sexes)
+        if response_format == 'csv':
+            data = CSV_HEADER + _csv_rows(ages, heights, sexes, percentiles)
+            await self._send(writer, 200, 'text/csv', data.encode())
+        else:
+            data = json.dumps(_json_rows(ages, heights, sexes, percentiles)[0])
+            await self._send(writer, 200, 'application/json', data.encode())
+
+    async def score_batch(self, headers, body, writer):
+        request_format, response_format = self._formats(headers)
+        ages, heights, sexes = parse_csv(body) if request_format == 'csv' else parse_json(body)
+
+        # Queue every chunk at once so they join the shared batches; stream them in order
+        chunks = [(ages[i:i + STREAM_ROWS], heights[i:i + STREAM_ROWS], sexes[i:i + STREAM_ROWS])
+                  for i in range(0, len(ages), STREAM_ROWS)]
+        tasks = [asyncio.ensure_future(self.batcher.score(*chunk)) for chunk in chunks]
+
+        content_type = 'text/csv' if response_format == 'csv' else 'application/json'
+        self._start_chunked(writer, content_type)
+        try:
+            self._write_chunk(writer, CSV_HEADER if response_format == 'csv' else '[')
+            for i, (chunk, task) in enumerate(zip(chunks, tasks)):
+                percentiles = await task
+                if response_format == 'csv':
+                    data = _csv_rows(*chunk, percentiles)
+                else:
+                    rows = json.dumps(_json_rows(*chunk, percentiles))[1:-1]
+                    data = (',' if i and rows else '') + rows
+                self._write_chunk(writer, data)
+                await writer.drain()
+            if response_format == 'json':
+                self._write_chunk(writer, ']')
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+            self._streaming.discard(writer)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # HTTP responses
+
+    @staticmethod
+    def _head(status, content_type, extra):
+        return (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                f"Content-Type: {content_type}\r\n{extra}\r\n").encode('latin-1')
+
+    async def _send(self, writer, status, content_type, data):
+        writer.write(self._head(status, content_type, f"Content-Length: {len(data)}\r\n") + data)
+        await writer.drain()
+
+    async def _send_error(self, writer, error):
+        data = json.dumps({'error': str(error)}).encode()
+        await self._send(writer, error.status, 'application/json', data)
+
+    def _start_chunked(self, writer, content_type):
+        self._streaming.add(writer)
+        writer.write(self._head(200, content_type, "Transfer-Encoding: chunked\r\n"))
+
+    @staticmethod
+    def _write_chunk(writer, text):
+        if text:
+            data = text.encode('utf-8')
+            writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+
+async def serve(host='127.0.0.1', port=8765, max_batch=16_384, max_delay=0.001):
+    # Load the reference tables before accepting requests
+    from who_data import create_percentile_interpolators, reference_age_range
+    create_percentile_interpolators()
+    reference_age_range()
+
+    batcher = ScoringBatcher(max_rows=max_batch, max_delay=max_delay)
+    server = ScoringServer(batcher)
+    batch_task = asyncio.ensure_future(batcher.run())
+    tcp_server = await asyncio.start_server(server.handle_connection, host, port)
+    print(f"Scoring service listening on http://{host}:{port}")
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m scoring_service',
+        description="Serve WHO height-for-age percentile scoring over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument('--max-batch', type=int, default=16_384,
+                        help="most measurements scored in one coalesced batch (default: 16384)")
+    parser.add_argument('--max-delay-ms', type=float, default=1.0,
+                        help="how long a batch waits for more requests (default: 1 ms)")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_delay_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
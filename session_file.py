@@ -0,0 +1,240 @@
+"""
+Single-file sessions: all datasets, birthdates and view settings
+
+File layout (little endian):
+    b'CGASESS1'                          magic
+    data blocks                          per dataset: ages, heights and
+                                         measurement dates (days since
+                                         1970-01-01, NaN if unknown) as
+                                         float64, each block 64-byte aligned
+    index                                UTF-8 JSON: datasets with their
+                                         block offsets, birthdates, settings
+    index offset, index length (u64)     trailer
+    b'CGASESS1'                          magic
+
+Loading reads the trailer and the index and maps the data blocks with
+np.memmap, so the measurements go from the page cache straight into the
+MeasurementStore without any parsing. Saving is incremental: blocks of
+datasets whose measurements changed, and a new index, are appended to the
+end of the file; unchanged datasets keep their blocks. Superseded blocks
+and indexes are dead space until the file is compacted (rewritten), which
+happens once they outweigh the live data.
+
+An append that fails is cut off again; one interrupted by a crash leaves a
+tail without a valid trailer, and loading then falls back to the trailer of
+the previous save in front of it.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'CGASESS1'
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)  # version 1 blocks have no dates row
+ALIGNMENT = 64
+TRAILER = struct.Struct('<QQ8s')
+
+# Compact once more than this many dead bytes outweigh the live data
+MIN_COMPACT_BYTES = 1 << 20
+
+
+class SessionError(ValueError):
+    """Raised for files that are not valid session files"""
+
+
+class SessionFile:
+    """A session file on disk and the dataset blocks last written to it.
+
+    `settings` is a JSON-serializable dict (gender selection, view state,
+    ...) stored alongside the datasets.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = {}  # Format: {name: {'offset': int, 'count': int, 'rows': int, 'revision': store revision}}
+
+    def load(self, store):
+        """Replace the contents of `store` with the session; returns the settings.
+
+        `store` is left untouched if the file cannot be read.
+        """
+        file_name = os.path.basename(self.path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise SessionError(f"{file_name} is not a session file")
+            index = self._read_index(f)
+        if index is None:
+            raise SessionError(f"{file_name} is incomplete or damaged")
+        if index.get('version') not in READABLE_VERSIONS:
+            raise SessionError(f"Unsupported session file version: {index.get('version')}")
+
+        try:
+            datasets = [(dataset, self._map_block(dataset['offset'], dataset['count'],
+                                                  dataset.get('rows', 2)))
+                        for dataset in index['datasets']]
+        except (KeyError, TypeError, ValueError):
+            raise SessionError(f"{file_name} is incomplete or damaged")
+
+        store.clear()
+        self.blocks = {}
+        for dataset, (ages, heights, dates) in datasets:
+            name = dataset['name']
+            store.add_dataset(name, ages, heights, dataset.get('birthdate'), dates)
+            self.blocks[name] = {'offset': dataset['offset'], 'count': dataset['count'],
+                                 'rows': dataset.get('rows', 2), 'revision': store.revision(name)}
+        return index.get('settings', {})
+
+    @staticmethod
+    def _read_index(f):
+        """The index of the last complete save, or None.
+
+        Searches backwards from the end of the file for a trailer that
+        directly follows the index it points to, skipping the tail of an
+        interrupted append.
+        """
+        if os.fstat(f.fileno()).st_size < len(MAGIC) + TRAILER.size:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = len(data)
+            while True:
+                position = data.rfind(MAGIC, TRAILER.size, end)
+                if position < 0:
+                    return None
+                end = position + len(MAGIC) - 1
+                trailer_offset = position + len(MAGIC) - TRAILER.size
+                index_offset, index_length, _ = TRAILER.unpack(
+                    data[trailer_offset:trailer_offset + TRAILER.size])
+                if index_offset < len(MAGIC) or index_offset + index_length != trailer_offset:
+                    continue
+                try:
+                    index = json.loads(data[index_offset:trailer_offset].decode('utf-8'))
+                except ValueError:
+                    continue
+                if isinstance(index, dict):
+                    return index
+
+    def _map_block(self, offset, count, rows):
+        """Read-only views of the ages and heights of one block, and its dates (or None)"""
+        if count == 0:
+            return np.empty(0), np.empty(0), None
+        block = np.memmap(self.path, dtype='<f8', mode='r', offset=offset, shape=(rows, count))
+        if rows < 3:
+            return block[0], block[1], None
+        days = block[2]
+        dates = np.where(np.isnan(days), np.iinfo(np.int64).min, days).astype(np.int64)
+        return block[0], block[1], dates.view('datetime64[D]')
+
+    def save(self, store, settings=None):
+        """Write the session, appending only the datasets changed since the last save"""
+        live = store.names()
+        if not os.path.exists(self.path) or not self.blocks:
+            self._write_all(store, settings)
+            return
+
+        changed = [name for name in live
+                   if name not in self.blocks or self.blocks[name]['revision'] != store.revision(name)]
+        kept_bytes = sum(self._block_size(self.blocks[name]['count'], self.blocks[name]['rows'])
+                         for name in live if name not in changed)
+        new_bytes = sum(self._block_size(store.count(name), 3) for name in changed)
+        dead_bytes = os.path.getsize(self.path) - kept_bytes
+        if dead_bytes > max(kept_bytes + new_bytes, MIN_COMPACT_BYTES):
+            self._write_all(store, settings)
+            return
+
+        size = os.path.getsize(self.path)
+        blocks = dict(self.blocks)
+        try:
+            with open(self.path, 'r+b') as f:
+                f.seek(size)
+                for name in changed:
+                    self._write_block(f, store, name)
+                self.blocks = {name: self.blocks[name] for name in live}
+                self._write_index(f, store, settings)
+        except BaseException:
+            # Leave the file as the previous save wrote it
+            self.blocks = blocks
+            os.truncate(self.path, size)
+            raise
+
+    def _write_all(self, store, settings):
+        """Write a fresh, compact file next to the old one and swap it in"""
+        temp_path = self.path + '.tmp'
+        self.blocks = {}
+        with open(temp_path, 'wb') as f:
+            f.write(MAGIC)
+            for name in store:
+                self._write_block(f, store, name)
+            self._write_index(f, store, settings)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _block_size(count, rows):
+        return rows * 8 * count
+
+    def _write_block(self, f, store, name):
+        offset = f.tell()
+        padding = -offset % ALIGNMENT
+        f.write(b'\0' * padding)
+        offset += padding
+        dates = store.dates(name)
+        days = np.where(np.isnat(dates), np.nan, dates.view(np.int64))
+        block = np.stack([store.ages(name), store.heights(name), days]).astype('<f8', copy=False)
+        f.write(block.tobytes())
+        self.blocks[name] = {'offset': offset, 'count': store.count(name), 'rows': 3,
+                             'revision': store.revision(name)}
+
+    def _write_index(self, f, store, settings):
+        index = {
+            'version': FORMAT_VERSION,
+            'datasets': [{'name': name,
+                          'birthdate': store.get_birthdate(name),
+                          'offset': self.blocks[name]['offset'],
+                          'count': self.blocks[name]['count'],
+                          'rows': self.blocks[name]['rows']}
+                         for name in store],
+            'settings': settings or {},
+        }
+        data = json.dumps(index).encode('utf-8')
+        index_offset = f.tell()
+        f.write(data)
+        # The trailer goes last so an interrupted save leaves no valid-looking tail
+        f.flush()
+        os.fsync(f.fileno())
+        f.write(TRAILER.pack(index_offset, len(data), MAGIC))
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from measurement_store import MeasurementStore
+
+    # A save cut off partway through its append must not lose the session
+    store = MeasurementStore()
+    store.add_dataset('a', [1.0, 2.0], [75.0, 86.0], '01.02.2020')
+    store.add_dataset('b', [3.0], [95.0])
+    with tempfile.TemporaryDirectory() as directory:
+        session = SessionFile(os.path.join(directory, 'test.cgsession'))
+        session.save(store, {'gender': 'girls'})
+        size = os.path.getsize(session.path)
+        store.append('a', 3.0, 95.0)
+        session.save(store, {'gender': 'boys'})
+        full_size = os.path.getsize(session.path)
+        for cut in (size + 1, (size + full_size) // 2, full_size - 1):
+            os.truncate(session.path, cut)
+            loaded = MeasurementStore()
+            assert SessionFile(session.path).load(loaded) == {'gender': 'girls'}
+            assert loaded.names() == ['a', 'b'] and loaded.count('a') == 2
+            assert loaded.get_birthdate('a') == '01.02.2020'
+        # Later saves append after the damaged tail and are read again
+        session = SessionFile(session.path)
+        session.load(loaded)
+        loaded.append('b', 4.0, 102.0)
+        session.save(loaded, {'gender': 'both'})
+        reloaded = MeasurementStore()
+        assert SessionFile(session.path).load(reloaded) == {'gender': 'both'}
+        assert reloaded.count('b') == 2 and np.array_equal(reloaded.heights('b'), [95.0, 102.0])
+    print("ok")
@@ -0,0 +1,113 @@
+"""
+SQLite database of children and their measurements
+
+An optional alternative to loose CSV files for keeping many children:
+
+    children(id, name, birthdate)
+    measurements(child_id, age, height, date)   indexed on (child_id, age)
+
+The measurement date (ISO 'YYYY-MM-DD') is optional; databases created
+before it existed get the column added when opened.
+
+Children are loaded one query per child through the index, so only the
+selected children are ever read into memory.
+"""
+
+import sqlite3
+from itertools import repeat
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS children (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    birthdate TEXT
+);
+CREATE TABLE IF NOT EXISTS measurements (
+    child_id INTEGER NOT NULL REFERENCES children(id) ON DELETE CASCADE,
+    age REAL,  -- NULL for dated measurements of children without a birthdate
+    height REAL NOT NULL,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS measurements_child_age ON measurements (child_id, age);
+"""
+
+
+class MeasurementDatabase:
+    """Children and measurements in an SQLite file, loaded into and saved from a MeasurementStore"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(measurements)")]
+        if 'date' not in columns:
+            self.connection.execute("ALTER TABLE measurements ADD COLUMN date TEXT")
+        self.saved_revisions = {}  # Format: {name: store revision last loaded or saved}
+
+    def close(self):
+        self.connection.close()
+
+    def children(self, name_filter=None):
+        """(name, birthdate, measurement count) of all children, optionally filtered by a name substring"""
+        query = ("SELECT c.name, c.birthdate, "
+                 "(SELECT COUNT(*) FROM measurements m WHERE m.child_id = c.id) "
+                 "FROM children c")
+        params = ()
+        if name_filter:
+            query += " WHERE c.name LIKE ?"
+            params = (f"%{name_filter}%",)
+        return self.connection.execute(query + " ORDER BY c.name", params).fetchall()
+
+    def load_children(self, names, store):
+        """Add the given children to `store` (replacing datasets of the same name)"""
+        for name in names:
+            row = self.connection.execute(
+                "SELECT id, birthdate FROM children WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                raise KeyError(f"No child named '{name}' in {self.path}")
+            child_id, birthdate = row
+
+            values = self.connection.execute(
+                "SELECT age, height, date FROM measurements WHERE child_id = ? ORDER BY age",
+                (child_id,)).fetchall()
+            numbers = np.array([row[:2] for row in values], dtype=float).reshape(-1, 2)
+            dates = np.array([row[2] or 'NaT' for row in values], dtype='datetime64[D]')
+            store.add_dataset(name, numbers[:, 0], numbers[:, 1], birthdate, dates)
+            self.saved_revisions[name] = store.revision(name)
+
+    def save_children(self, store, names=None):
+        """Write datasets of `store` (all by default) in one transaction.
+
+        Measurements are only rewritten for datasets that changed since they
+        were last loaded from or saved to this database; birthdates are
+        always updated. Returns the number of children whose measurements
+        were written.
+        """
+        names = store.names() if names is None else names
+        written = 0
+        with self.connection:
+            for name in names:
+                self.connection.execute(
+                    "INSERT INTO children (name, birthdate) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET birthdate = excluded.birthdate",
+                    (name, store.get_birthdate(name)))
+                if self.saved_revisions.get(name) == store.revision(name):
+                    continue
+
+                child_id = self.connection.execute(
+                    "SELECT id FROM children WHERE name = ?", (name,)).fetchone()[0]
+                self.connection.execute("DELETE FROM measurements WHERE child_id = ?", (child_id,))
+                dates = [None if date == 'NaT' else date
+                         for date in np.datetime_as_string(store.dates(name)).tolist()]
+                self.connection.executemany(
+                    "INSERT INTO measurements (child_id, age, height, date) VALUES (?, ?, ?, ?)",
+                    zip(repeat(child_id), store.ages(name).tolist(), store.heights(name).tolist(),
+                        dates))
+                written += 1
+
+        for name in names:
+            self.saved_revisions[name] = store.revision(name)
+        return written
@@ -0,0 +1,153 @@
+"""
+Virtualized table view for datasets with many measurements
+
+A ttk.Treeview with one item per measurement gets slow to fill and to clear
+once a dataset has tens of thousands of rows. VirtualTable keeps only as
+many Treeview items as fit on screen and refills their values from numpy
+column arrays when the table is scrolled, resized or sorted.
+"""
+
+from tkinter import ttk
+
+# numpy is imported on first use so that creating the (empty) table at
+# startup does not load it
+
+SORT_ARROWS = {False: ' ▲', True: ' ▼'}
+
+
+class VirtualTable:
+    """Treeview showing a scrollable window onto column arrays.
+
+    `columns` is a list of (column id, heading text, format) tuples, e.g.
+    ('Age', 'Age (years)', '{:.2f}'); the format is a format string or a
+    function returning the text of one value. Clicking a heading sorts by that
+    column; clicking it again reverses the order. `sort_column` is the
+    column sorted by until a heading is clicked. Columns start out
+    `column_width` pixels wide.
+    """
+
+    def __init__(self, parent, columns, height=10, sort_column=None, column_width=100):
+        self.column_ids = [column_id for column_id, _, _ in columns]
+        self.headings = {column_id: text for column_id, text, _ in columns}
+        self.formats = {column_id: fmt.format if isinstance(fmt, str) else fmt
+                        for column_id, _, fmt in columns}
+
+        self.tree = ttk.Treeview(parent, columns=self.column_ids, show="headings",
+                                 height=height, selectmode="none")
+        for column_id in self.column_ids:
+            self.tree.heading(column_id, text=self.headings[column_id],
+                              command=lambda c=column_id: self.sort_by(c))
+            self.tree.column(column_id, width=column_width, minwidth=50)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+
+        self.data = {}          # Format: {column id: array}
+        self.order = []         # row numbers in display order
+        self.sort_column = sort_column
+        self.descending = False
+        self.first = 0          # display position of the top visible row
+        self.visible_rows = height
+
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+
+    def __len__(self):
+        return len(self.order)
+
+    def grid(self, row, column, **kwargs):
+        """Place the table and its scrollbar in a grid layout"""
+        self.tree.grid(row=row, column=column, **kwargs)
+        self.scrollbar.grid(row=row, column=column + kwargs.get('columnspan', 1), sticky="ns")
+
+    def set_data(self, data):
+        """Show new column arrays ({column id: array}) in the current sort order"""
+        import numpy as np
+        self.data = {column_id: np.asarray(data[column_id]) for column_id in self.column_ids}
+        self._sort()
+        self.first = 0
+        self._render()
+
+    def clear(self):
+        self.set_data({column_id: [] for column_id in self.column_ids})
+
+    def sort_by(self, column_id):
+        """Sort by a column (heading click); a second click reverses the order"""
+        if column_id == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = column_id
+            self.descending = False
+        self._sort()
+        self.first = 0
+        self._render()
+
+    def _sort(self):
+        import numpy as np
+        count = len(self.data[self.column_ids[0]]) if self.data else 0
+        if self.sort_column is None or count == 0:
+            self.order = np.arange(count)
+        else:
+            self.order = np.argsort(self.data[self.sort_column], kind='stable')
+            if self.descending:
+                self.order = self.order[::-1]
+
+        for column_id in self.column_ids:
+            arrow = SORT_ARROWS[self.descending] if column_id == self.sort_column else ''
+            self.tree.heading(column_id, text=self.headings[column_id] + arrow)
+
+    # Scrolling
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'/'pages')"""
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * len(self)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= max(self.visible_rows - 1, 1)
+            self.scroll(step)
+
+    def scroll(self, rows):
+        self.scroll_to(self.first + rows)
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self) - self.visible_rows))
+        if first != self.first:
+            self.first = first
+            self._render()
+
+    def _on_mousewheel(self, event):
+        # Windows and macOS report the wheel in multiples of 120
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_configure(self, event):
+        """Show as many rows as fit after the table was resized"""
+        style = ttk.Style()
+        row_height = int(style.lookup('Treeview', 'rowheight') or 20)
+        rows = max(1, event.height // row_height - 1)  # minus the heading row
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.first = max(0, min(self.first, len(self) - rows))
+            self._render()
+
+    def _render(self):
+        """Fill the Treeview items with the rows of the visible window"""
+        window = self.order[self.first:self.first + self.visible_rows]
+        columns = [[self.formats[c](value) for value in self.data[c][window]]
+                   for c in self.column_ids] if len(window) else []
+
+        items = self.tree.get_children()
+        if len(items) > len(window):
+            self.tree.delete(*items[len(window):])
+        for i, values in enumerate(zip(*columns)):
+            if i < len(items):
+                self.tree.item(items[i], values=values)
+            else:
+                self.tree.insert("", "end", values=values)
+
+        if len(self):
+            self.scrollbar.set(self.first / len(self), (self.first + len(window)) / len(self))
+        else:
+            self.scrollbar.set(0, 1)
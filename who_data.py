@@ -1,13 +1,25 @@
 """
-WHO Growth Standards data for height-for-age percentiles
+WHO Growth Standards data for height-for-age percentiles and other indicators
 Data source: World Health Organization (WHO) Child Growth Standards
+
+Every reference indicator (height-for-age, weight-for-age, BMI-for-age, head
+circumference-for-age) is a pair of WHO percentile tables, one per sex, in
+who_data/. All of them go through the same CSV parser, the same precomputed
+artifact and the same ReferenceEngine; an indicator's tables are only read
+the first time it is used. Functions default to height-for-age.
 """
 
-import pandas as pd
-from scipy.interpolate import interp1d
+import time
+_import_start = time.perf_counter()
+
 import numpy as np
+import hashlib
 import os
 import sys
+import threading
+from collections import OrderedDict
+
+from instrumentation import record, span, timed
 
 # Get the base directory - works both in development and when packaged
 if getattr(sys, 'frozen', False):
@@ -17,163 +29,303 @@ else:
     # Running as script
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Construct relative paths to WHO data files
-boys_file = os.path.join(base_dir, 'who_data', 'hfa-boys-perc-who2007-exp.csv')
-girls_file = os.path.join(base_dir, 'who_data', 'hfa-girls-perc-who2007-exp.csv')
-
-# Read boys data
-boys_df = pd.read_csv(
-    boys_file, 
-    header=0,        # Skip the first row (header)
-    delimiter=';', 
-    decimal=',',
-    skiprows=1       # Skip the header row
-)
-boys_df.columns = ['Age_months', 'P01', 'P1', 'P3', 'P5', 'P10', 'P15', 'P25', 'P50', 
+data_dir = os.path.join(base_dir, 'who_data')
+REFERENCE_FORMAT_VERSION = 3
+
+PERCENTILE_KEYS = ['P01', 'P1', 'P3', 'P5', 'P10', 'P15', 'P25', 'P50',
                    'P75', 'P85', 'P90', 'P95', 'P97', 'P99', 'P999']
+PERCENTILE_VALUES = [0.1, 1, 3, 5, 10, 15, 25, 50, 75, 85, 90, 95, 97, 99, 99.9]
+
+# Average month length used by the WHO tables, for tables listed by day
+DAYS_PER_MONTH = 30.4375
+
+
+class ReferenceIndicator:
+    """A WHO reference indicator: per-sex percentile CSVs and their precomputed tables.
+
+    The CSVs are semicolon separated with a decimal comma, like the WHO
+    expanded percentile tables: a 'Month' (or 'Day') column followed by the
+    PERCENTILE_KEYS columns; optional L, M, S columns are used as they are
+    instead of being fitted.
+    """
+
+    def __init__(self, key, label, files, artifact):
+        self.key = key
+        self.label = label        # e.g. 'Height-for-age'
+        self.files = files        # Format: {'boys': file name, 'girls': file name}
+        self.artifact = artifact  # precomputed tables file name
+
+    def source_paths(self):
+        return {sex: os.path.join(data_dir, name) for sex, name in self.files.items()}
+
+    @property
+    def artifact_path(self):
+        return os.path.join(data_dir, self.artifact)
+
+    def has_source_files(self):
+        """True if all WHO CSV files are present, so the tables can be (re)built"""
+        return all(os.path.exists(path) for path in self.source_paths().values())
+
 
-# Read girls data
-girls_df = pd.read_csv(
-    girls_file, 
-    header=0,        # Skip the first row (header)
-    delimiter=';', 
-    decimal=',',
-    skiprows=1       # Skip the header row
-)
-girls_df.columns = ['Age_months', 'P01', 'P1', 'P3', 'P5', 'P10', 'P15', 'P25', 'P50', 
-                    'P75', 'P85', 'P90', 'P95', 'P97', 'P99', 'P999']
-
-# Convert data to dictionaries
-WHO_BOYS_PERCENTILES = {}
-WHO_GIRLS_PERCENTILES = {}
-
-# Process boys data
-for _, row in boys_df.iterrows():
+INDICATORS = {}  # Format: {key: ReferenceIndicator}
+DEFAULT_INDICATOR = 'height'
+
+
+def register_indicator(indicator):
+    """Add (or replace) a reference indicator; its tables are not loaded until first use"""
+    INDICATORS[indicator.key] = indicator
+    return indicator
+
+
+def get_indicator(key=DEFAULT_INDICATOR):
     try:
-        months = float(str(row['Age_months']).replace(',', '.'))
-        years = months / 12
-        
-        # Only include data points at specified intervals
-        if years <= 5:
-            if months % 6 == 0:  # Every 6 months for ages 0-5
-                age = round(years, 1)
-                WHO_BOYS_PERCENTILES[age] = {
-                    'P01': float(str(row['P01']).replace(',', '.')),
-                    'P1': float(str(row['P1']).replace(',', '.')),
-                    'P3': float(str(row['P3']).replace(',', '.')),
-                    'P5': float(str(row['P5']).replace(',', '.')),
-                    'P10': float(str(row['P10']).replace(',', '.')),
-                    'P15': float(str(row['P15']).replace(',', '.')),
-                    'P25': float(str(row['P25']).replace(',', '.')),
-                    'P50': float(str(row['P50']).replace(',', '.')),
-                    'P75': float(str(row['P75']).replace(',', '.')),
-                    'P85': float(str(row['P85']).replace(',', '.')),
-                    'P90': float(str(row['P90']).replace(',', '.')),
-                    'P95': float(str(row['P95']).replace(',', '.')),
-                    'P97': float(str(row['P97']).replace(',', '.')),
-                    'P99': float(str(row['P99']).replace(',', '.')),
-                    'P999': float(str(row['P999']).replace(',', '.'))
-                }
-        else:
-            if months % 12 == 0:  # Every 12 months for ages 5+
-                age = int(years)
-                WHO_BOYS_PERCENTILES[age] = {
-                    'P01': float(str(row['P01']).replace(',', '.')),
-                    'P1': float(str(row['P1']).replace(',', '.')),
-                    'P3': float(str(row['P3']).replace(',', '.')),
-                    'P5': float(str(row['P5']).replace(',', '.')),
-                    'P10': float(str(row['P10']).replace(',', '.')),
-                    'P15': float(str(row['P15']).replace(',', '.')),
-                    'P25': float(str(row['P25']).replace(',', '.')),
-                    'P50': float(str(row['P50']).replace(',', '.')),
-                    'P75': float(str(row['P75']).replace(',', '.')),
-                    'P85': float(str(row['P85']).replace(',', '.')),
-                    'P90': float(str(row['P90']).replace(',', '.')),
-                    'P95': float(str(row['P95']).replace(',', '.')),
-                    'P97': float(str(row['P97']).replace(',', '.')),
-                    'P99': float(str(row['P99']).replace(',', '.')),
-                    'P999': float(str(row['P999']).replace(',', '.'))
-                }
-    except ValueError as e:
-        continue  # Skip any rows that can't be converted to numbers
-
-# Process girls data
-for _, row in girls_df.iterrows():
+        return INDICATORS[key]
+    except KeyError:
+        raise KeyError(f"Unknown reference indicator '{key}'. "
+                       f"Available: {', '.join(INDICATORS)}") from None
+
+
+register_indicator(ReferenceIndicator(
+    'height', 'Height-for-age',
+    {'boys': 'hfa-boys-perc-who2007-exp.csv', 'girls': 'hfa-girls-perc-who2007-exp.csv'},
+    'hfa-who2007-reference.npz'))
+register_indicator(ReferenceIndicator(
+    'weight', 'Weight-for-age',
+    {'boys': 'wfa-boys-perc-who2007-exp.csv', 'girls': 'wfa-girls-perc-who2007-exp.csv'},
+    'wfa-who2007-reference.npz'))
+register_indicator(ReferenceIndicator(
+    'bmi', 'BMI-for-age',
+    {'boys': 'bfa-boys-perc-who2007-exp.csv', 'girls': 'bfa-girls-perc-who2007-exp.csv'},
+    'bfa-who2007-reference.npz'))
+register_indicator(ReferenceIndicator(
+    'head_circumference', 'Head circumference-for-age',
+    {'boys': 'hcfa-boys-perc-who2006-exp.csv', 'girls': 'hcfa-girls-perc-who2006-exp.csv'},
+    'hcfa-who2006-reference.npz'))
+
+# Height-for-age files, kept under their original names
+boys_file = os.path.join(data_dir, INDICATORS['height'].files['boys'])
+girls_file = os.path.join(data_dir, INDICATORS['height'].files['girls'])
+reference_file = INDICATORS['height'].artifact_path
+
+
+def _source_digest(indicator=DEFAULT_INDICATOR):
+    """SHA-256 over an indicator's WHO CSV files, or None when they are not available."""
+    digest = hashlib.sha256()
+    for path in get_indicator(indicator).source_paths().values():
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _parse_reference_csv(path):
+    """Parse one WHO CSV into (ages in months, percentile matrix, L/M/S matrix or None) for every month."""
+    import pandas as pd
+
+    df = pd.read_csv(
+        path,
+        header=0,        # First row is the header
+        delimiter=';',
+        decimal=',',
+        encoding='utf-8-sig'
+    )
+    df.columns = [str(column).strip() for column in df.columns]
+    age_column = 'Day' if 'Day' in df.columns else 'Month'
+    missing = [column for column in [age_column] + PERCENTILE_KEYS if column not in df.columns]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} is missing the columns: {', '.join(missing)}")
+    columns = PERCENTILE_KEYS + (['L', 'M', 'S'] if {'L', 'M', 'S'} <= set(df.columns) else [])
+    df = df[[age_column] + columns].apply(pd.to_numeric, errors='coerce').dropna()
+
+    ages = df[age_column].to_numpy(dtype=float)
+    values = df[columns].to_numpy(dtype=float)
+    if age_column == 'Day':
+        # Resample daily tables at whole months
+        days = ages
+        ages = np.arange(np.ceil(days[0] / DAYS_PER_MONTH), np.floor(days[-1] / DAYS_PER_MONTH) + 1)
+        values = np.column_stack([np.interp(ages * DAYS_PER_MONTH, days, column) for column in values.T])
+    lms = values[:, len(PERCENTILE_KEYS):] if len(columns) > len(PERCENTILE_KEYS) else None
+    return ages, values[:, :len(PERCENTILE_KEYS)], lms
+
+
+def _summary_rows(months):
+    """Rows listed in WHO_*_PERCENTILES: every 6 months for ages 0-5, every 12 months above"""
+    return np.where(months <= 60, months % 6 == 0, months % 12 == 0)
+
+
+@timed('WHO tables build from CSV')
+def _tables_from_csv(indicator=DEFAULT_INDICATOR):
+    from lms import fit_lms
+
+    indicator = get_indicator(indicator)
+    paths = indicator.source_paths()
+    missing = [path for path in paths.values() if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(
+            f"WHO {indicator.label} reference data not found. Save the WHO expanded percentile "
+            f"tables (Month;P01;...;P999, semicolon separated) as: {', '.join(missing)}")
+
+    tables = {}
+    for sex, path in paths.items():
+        months, table, lms = _parse_reference_csv(path)
+        tables[sex] = {
+            'months': months,
+            'percentiles': table,
+            'lms': lms if lms is not None else fit_lms(PERCENTILE_VALUES, table),
+        }
+    return tables
+
+
+def build_reference_artifact(path=None, indicator=DEFAULT_INDICATOR):
+    """Parse an indicator's WHO CSVs and write its precomputed reference tables to `path`."""
+    path = path or get_indicator(indicator).artifact_path
+    tables = _tables_from_csv(indicator)
+    arrays = {
+        'format_version': np.array(REFERENCE_FORMAT_VERSION),
+        'source_digest': np.array(_source_digest(indicator) or ''),
+    }
+    for sex, data in tables.items():
+        for name, values in data.items():
+            arrays[f'{sex}_{name}'] = values
+    np.savez(path, **arrays)
+    return path
+
+
+def _load_reference_artifact(indicator=DEFAULT_INDICATOR):
+    """Load an indicator's precomputed tables, or return None if missing or stale."""
+    path = get_indicator(indicator).artifact_path
+    if not os.path.exists(path):
+        return None
     try:
-        months = float(str(row['Age_months']).replace(',', '.'))
-        years = months / 12
-        
-        # Only include data points at specified intervals
-        if years <= 5:
-            if months % 6 == 0:  # Every 6 months for ages 0-5
-                age = round(years, 1)
-                WHO_GIRLS_PERCENTILES[age] = {
-                    'P01': float(str(row['P01']).replace(',', '.')),
-                    'P1': float(str(row['P1']).replace(',', '.')),
-                    'P3': float(str(row['P3']).replace(',', '.')),
-                    'P5': float(str(row['P5']).replace(',', '.')),
-                    'P10': float(str(row['P10']).replace(',', '.')),
-                    'P15': float(str(row['P15']).replace(',', '.')),
-                    'P25': float(str(row['P25']).replace(',', '.')),
-                    'P50': float(str(row['P50']).replace(',', '.')),
-                    'P75': float(str(row['P75']).replace(',', '.')),
-                    'P85': float(str(row['P85']).replace(',', '.')),
-                    'P90': float(str(row['P90']).replace(',', '.')),
-                    'P95': float(str(row['P95']).replace(',', '.')),
-                    'P97': float(str(row['P97']).replace(',', '.')),
-                    'P99': float(str(row['P99']).replace(',', '.')),
-                    'P999': float(str(row['P999']).replace(',', '.'))
-                }
-        else:
-            if months % 12 == 0:  # Every 12 months for ages 5+
-                age = int(years)
-                WHO_GIRLS_PERCENTILES[age] = {
-                    'P01': float(str(row['P01']).replace(',', '.')),
-                    'P1': float(str(row['P1']).replace(',', '.')),
-                    'P3': float(str(row['P3']).replace(',', '.')),
-                    'P5': float(str(row['P5']).replace(',', '.')),
-                    'P10': float(str(row['P10']).replace(',', '.')),
-                    'P15': float(str(row['P15']).replace(',', '.')),
-                    'P25': float(str(row['P25']).replace(',', '.')),
-                    'P50': float(str(row['P50']).replace(',', '.')),
-                    'P75': float(str(row['P75']).replace(',', '.')),
-                    'P85': float(str(row['P85']).replace(',', '.')),
-                    'P90': float(str(row['P90']).replace(',', '.')),
-                    'P95': float(str(row['P95']).replace(',', '.')),
-                    'P97': float(str(row['P97']).replace(',', '.')),
-                    'P99': float(str(row['P99']).replace(',', '.')),
-                    'P999': float(str(row['P999']).replace(',', '.'))
-                }
-    except ValueError as e:
-        continue  # Skip any rows that can't be converted to numbers
-
-def create_percentile_interpolators():
-    """Create interpolation functions for each percentile for both boys and girls."""
-    percentiles = ['P01', 'P1', 'P3', 'P5', 'P10', 'P15', 'P25', 'P50',
-                  'P75', 'P85', 'P90', 'P95', 'P97', 'P99', 'P999']
-    
-    boys_interpolators = {}
-    girls_interpolators = {}
-    
-    # Create interpolators for boys
-    ages_boys = sorted(WHO_BOYS_PERCENTILES.keys())
-    for p in percentiles:
-        heights = [WHO_BOYS_PERCENTILES[age][p] for age in ages_boys]
-        boys_interpolators[p] = interp1d(ages_boys, heights, kind='cubic')
-    
-    # Create interpolators for girls
-    ages_girls = sorted(WHO_GIRLS_PERCENTILES.keys())
-    for p in percentiles:
-        heights = [WHO_GIRLS_PERCENTILES[age][p] for age in ages_girls]
-        girls_interpolators[p] = interp1d(ages_girls, heights, kind='cubic')
-    
+        with np.load(path) as data:
+            if int(data['format_version']) != REFERENCE_FORMAT_VERSION:
+                return None
+            digest = _source_digest(indicator)
+            if digest is not None and str(data['source_digest']) != digest:
+                return None
+            return {
+                sex: {key[len(sex) + 1:]: data[key] for key in data.files if key.startswith(f'{sex}_')}
+                for sex in ('boys', 'girls')
+            }
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Could not read WHO reference tables, parsing CSV instead: {e}")
+        return None
+
+
+def _tables_to_dict(months, table):
+    """Convert a monthly percentile matrix into the {age: {'P01': ..., ...}} layout."""
+    percentiles = {}
+    rows = _summary_rows(months)
+    for years, row in zip(months[rows] / 12, table[rows]):
+        age = round(float(years), 1) if years <= 5 else int(years)
+        percentiles[age] = dict(zip(PERCENTILE_KEYS, (float(v) for v in row)))
+    return percentiles
+
+
+_reference_tables = {}   # Format: {indicator key: tables}, filled on first use
+_reference_engines = {}  # Format: {indicator key: ReferenceEngine}
+_reference_lock = threading.Lock()
+
+
+def load_reference_tables(indicator=DEFAULT_INDICATOR):
+    """Return the WHO reference tables of an indicator, loading them on first use.
+
+    Prefers the precomputed artifact and falls back to the CSV files when it
+    is missing or out of date. Safe to call from a background thread.
+    """
+    if indicator not in _reference_tables:
+        get_indicator(indicator)
+        with _reference_lock:
+            if indicator not in _reference_tables:
+                with span('WHO tables load', indicator=indicator):
+                    _reference_tables[indicator] = (_load_reference_artifact(indicator) or
+                                                    _tables_from_csv(indicator))
+    return _reference_tables[indicator]
+
+
+def get_percentile_table(sex, indicator=DEFAULT_INDICATOR):
+    """Return the {age: {'P01': ..., ...}} percentile table for 'boys' or 'girls'."""
+    tables = load_reference_tables(indicator)[sex]
+    return _tables_to_dict(tables['months'], tables['percentiles'])
+
+
+def __getattr__(name):
+    # WHO_BOYS_PERCENTILES / WHO_GIRLS_PERCENTILES are built on first access
+    # so that importing this module does no file I/O
+    if name in ('WHO_BOYS_PERCENTILES', 'WHO_GIRLS_PERCENTILES'):
+        value = get_percentile_table('boys' if name == 'WHO_BOYS_PERCENTILES' else 'girls')
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_reference_engine(indicator=DEFAULT_INDICATOR):
+    """Return the shared ReferenceEngine over an indicator's monthly WHO tables"""
+    engine = _reference_engines.get(indicator)
+    if engine is None:
+        from reference_engine import ReferenceEngine
+        tables = load_reference_tables(indicator)
+        with span('WHO reference engine', indicator=indicator):
+            engine = ReferenceEngine(tables)
+        with _reference_lock:
+            engine = _reference_engines.setdefault(indicator, engine)
+    return engine
+
+def publish_reference_engine(indicator=DEFAULT_INDICATOR):
+    """Publish the shared engine's tables to shared memory for worker processes.
+
+    Returns (SharedMemory, handle); see ReferenceEngine.publish.
+    """
+    return get_reference_engine(indicator).publish()
+
+def attach_reference_engine(handle, indicator=DEFAULT_INDICATOR):
+    """Use tables published by another process as this process's reference engine"""
+    from reference_engine import ReferenceEngine
+    engine = ReferenceEngine.attach(handle)
+    with _reference_lock:
+        _reference_engines[indicator] = engine
+    return engine
+
+def reference_age_range(indicator=DEFAULT_INDICATOR):
+    """Return the (min, max) age in years covered by both reference tables"""
+    return get_reference_engine(indicator).age_range()
+
+def create_percentile_interpolators(indicator=DEFAULT_INDICATOR):
+    """Create interpolation functions for each percentile for both boys and girls.
+
+    The functions look ages up in the full monthly WHO tables (see
+    reference_engine), so creating them is cheap.
+    """
+    boys_interpolators, girls_interpolators = get_reference_engine(indicator).interpolators()
     return boys_interpolators, girls_interpolators
 
+_reference_curves = {}
+
+
+def reference_curves(sex, step=0.01, indicator=DEFAULT_INDICATOR):
+    """Return (ages, values) of all percentile curves for 'boys' or 'girls'.
+
+    The percentile curves are evaluated once on a fixed age grid (`step` years apart)
+    and cached, so drawing reference bands costs nothing after the first call.
+    `values` has one column per entry in PERCENTILE_KEYS. Both arrays are
+    read-only.
+    """
+    key = (indicator, sex, step)
+    if key not in _reference_curves:
+        engine = get_reference_engine(indicator)
+        min_age, max_age = engine.age_range(sex)
+        ages = np.arange(min_age, max_age + step / 2, step)
+        ages[-1] = min(ages[-1], max_age)
+        heights = engine.percentile_heights(ages, sex)
+        ages.flags.writeable = False
+        heights.flags.writeable = False
+        _reference_curves[key] = (ages, heights)
+    return _reference_curves[key]
+
 def calculate_exact_percentile(age, height, interpolators, gender='both'):
     """Calculate the exact percentile for a given height and age."""
-    percentiles = [0.1, 1, 3, 5, 10, 15, 25, 50, 75, 85, 90, 95, 97, 99, 99.9]
-    percentile_keys = ['P01', 'P1', 'P3', 'P5', 'P10', 'P15', 'P25', 'P50',
-                      'P75', 'P85', 'P90', 'P95', 'P97', 'P99', 'P999']
+    percentiles = PERCENTILE_VALUES
+    percentile_keys = PERCENTILE_KEYS
     
     boys_interp, girls_interp = interpolators
     
@@ -203,21 +355,178 @@ def calculate_exact_percentile(age, height, interpolators, gender='both'):
         else:
             return {'boys': None, 'girls': round(result, 1), 'average': round(result, 1)}
 
-# Clean up - remove the dataframes as they're no longer needed
-del boys_df
-del girls_df
+class PercentileCache:
+    """Bounded LRU cache for calculate_exact_percentile results.
+
+    Entries are keyed by (gender, age bucket, height); ages are rounded to
+    `age_resolution` years before the percentile is calculated, so every age
+    in a bucket gets the same result. When more than `maxsize` entries are
+    stored the least recently used one is evicted. Thread-safe.
+    """
+
+    def __init__(self, maxsize=4096, age_resolution=1e-4):
+        self.maxsize = maxsize
+        self.age_resolution = age_resolution
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize=None, age_resolution=None):
+        """Change the size limit and/or age bucket width; a new width clears the cache"""
+        with self._lock:
+            if age_resolution is not None and age_resolution != self.age_resolution:
+                self.age_resolution = age_resolution
+                self._entries.clear()
+            if maxsize is not None:
+                self.maxsize = maxsize
+                self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, age, height, gender, calculate):
+        """Return the cached result, or calculate(bucketed age, height, gender) and store it"""
+        bucket = round(age / self.age_resolution)
+        key = (gender, bucket, height)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = calculate(bucket * self.age_resolution, height, gender)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            self._evict()
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """Counters for monitoring: hits, misses, evictions, size, maxsize, hit_rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_percentile_cache = PercentileCache()
+
+
+def cached_exact_percentile(age, height, gender='both'):
+    """calculate_exact_percentile with the shared WHO interpolators, memoized in an LRU cache.
+
+    Results must not be modified by the caller. See configure_percentile_cache
+    and percentile_cache_info.
+    """
+    def calculate(age, height, gender):
+        return calculate_exact_percentile(age, height, create_percentile_interpolators(), gender=gender)
+    return _percentile_cache.get(age, height, gender, calculate)
+
+
+def configure_percentile_cache(maxsize=None, age_resolution=None):
+    """Set the maximum number of cached percentiles and/or the age bucket width in years"""
+    _percentile_cache.configure(maxsize=maxsize, age_resolution=age_resolution)
+
+
+def percentile_cache_info():
+    """Return the percentile cache counters (hits, misses, evictions, size, maxsize, hit_rate)"""
+    return _percentile_cache.info()
+
+
+def clear_percentile_cache():
+    _percentile_cache.clear()
+
+def _interp_rows(x, xp, fp):
+    """Row-wise np.interp: interpolate each x[i] against its own xp[i, :]."""
+    n, k = xp.shape
+    # Index of the first table height above x (same bracket np.interp picks)
+    idx = np.sum(xp <= x[:, None], axis=1)
+    idx = np.clip(idx, 1, k - 1)
+    rows = np.arange(n)
+    x0 = xp[rows, idx - 1]
+    x1 = xp[rows, idx]
+    y0 = fp[idx - 1]
+    y1 = fp[idx]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = y0 + (x - x0) * (y1 - y0) / (x1 - x0)
+    # np.interp clamps to the outermost values outside the table
+    result = np.where(x < xp[:, 0], fp[0], result)
+    result = np.where(x >= xp[:, -1], fp[-1], result)
+    return result
+
+def calculate_percentiles_batch(ages, heights, sexes, interpolators):
+    """Calculate exact percentiles for whole arrays of ages, heights and sexes.
+
+    Vectorized counterpart of calculate_exact_percentile. `sexes` is an array
+    (or a single string) of 'boys'/'male', 'girls'/'female' or 'both' per row.
+    Returns an array with the same values as the scalar function's 'average'
+    entry, i.e. the percentile for the given sex or the mean of both.
+    """
+    percentiles = np.array(PERCENTILE_VALUES)
+    percentile_keys = PERCENTILE_KEYS
+
+    ages = np.asarray(ages, dtype=float).ravel()
+    heights = np.asarray(heights, dtype=float).ravel()
+    sexes = np.broadcast_to(np.asarray(sexes, dtype=str), ages.shape)
+
+    boys_interp, girls_interp = interpolators
+    is_both = sexes == 'both'
+    is_male = np.isin(sexes, ['male', 'boys'])
+    is_female = ~(is_both | is_male)
+
+    result = np.full(ages.shape, np.nan)
+
+    # Evaluate each percentile curve once per sex over all relevant ages
+    boys_rows = is_male | is_both
+    girls_rows = is_female | is_both
+    boys_result = girls_result = None
+    if boys_rows.any():
+        table = np.column_stack([boys_interp[p](ages[boys_rows]) for p in percentile_keys])
+        boys_result = _interp_rows(heights[boys_rows], table, percentiles)
+    if girls_rows.any():
+        table = np.column_stack([girls_interp[p](ages[girls_rows]) for p in percentile_keys])
+        girls_result = _interp_rows(heights[girls_rows], table, percentiles)
+
+    if boys_result is not None:
+        result[is_male] = boys_result[is_male[boys_rows]]
+    if girls_result is not None:
+        result[is_female] = girls_result[is_female[girls_rows]]
+    if is_both.any():
+        result[is_both] = (boys_result[is_both[boys_rows]] +
+                           girls_result[is_both[girls_rows]]) / 2
+
+    return np.round(result, 1)
+
+record('import who_data', _import_start, time.perf_counter() - _import_start)
 
 if __name__ == "__main__":
     # Print some sample data to verify
     print("\nSample boys data at age 2.5 years:")
-    print(WHO_BOYS_PERCENTILES[2.5])
+    print(get_percentile_table('boys')[2.5])
     
     print("\nSample girls data at age 10 years:")
-    print(WHO_GIRLS_PERCENTILES[10])
+    print(get_percentile_table('girls')[10])
     
     # Test interpolation
     boys_interp, girls_interp = create_percentile_interpolators()
     test_age = 3.5
     test_height = 100
-    percentile = calculate_exact_percentile(test_age, test_height, (boys_interp, girls_interp), 'male')
-    print(f"\nTest: A {test_height}cm tall boy at {test_age} years is at the {percentile:.1f}th percentile") 
\ No newline at end of file
+    percentiles = calculate_exact_percentile(test_age, test_height, (boys_interp, girls_interp), 'male')
+    print(f"\nTest: A {test_height}cm tall boy at {test_age} years is at the {percentiles['boys']:.1f}th percentile") 
\ No newline at end of file